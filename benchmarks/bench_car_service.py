@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""CarService micro-benchmarks over synthetic catalogs, emitted as JSON.
+
+Covers catalog load, search_cars for every combination of filters (with the
+result cache cleared before each call, plus one cached lookup), fuzzy
+make/model resolution, get_car_by_id, the /stats aggregates and memory
+footprint. Save the output per commit and diff the files to compare.
+
+CarService keeps the catalog as columns and builds Car objects on demand;
+the generator itself scales to 10M rows.
+
+    python benchmarks/bench_car_service.py --rows 10000 100000 --output bench.json
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from benchmarks.catalog_generator import write_catalog
+from src.models.car import CarFilter
+from src.services.car_service import CarService
+
+FILTERS = {
+    "make": {"make": "Toyota"},
+    "model": {"model": "Corolla"},
+    "price": {"min_price": 200000, "max_price": 450000},
+    "km": {"max_km": 80000},
+    "year": {"min_year": 2018, "max_year": 2022},
+    "q": {"q": "automatico 4x4"},
+}
+FUZZY_QUERIES = {
+    "make_exact": {"make": "Volkswagen"},
+    "make_typo": {"make": "volkswagn"},
+    "make_and_model_typo": {"make": "nisan", "model": "sentr"},
+}
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a high-water mark (KiB on Linux, bytes on macOS)
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def timed(fn, repeat: int) -> dict:
+    """Best and median wall time of `repeat` calls, in microseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return {"best_us": round(min(samples), 1), "median_us": round(float(np.median(samples)), 1)}
+
+
+def catalog_path(rows: int, seed: int, cache_dir: str) -> str:
+    path = os.path.join(cache_dir, f"catalog_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        write_catalog(path, rows, seed)
+    return path
+
+
+def bench_size(rows: int, seed: int, repeat: int, cache_dir: str) -> dict:
+    path = catalog_path(rows, seed, cache_dir)
+    gc.collect()
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    car_service = CarService(path)
+    load_seconds = time.perf_counter() - started
+    gc.collect()
+    rss_after = rss_bytes()
+
+    def uncached(filters):
+        car_service._search_cache.clear()
+        car_service._name_cache.clear()
+        return car_service.search_cars(filters, 10)
+
+    search = {}
+    for size in range(len(FILTERS) + 1):
+        for names in itertools.combinations(FILTERS, size):
+            kwargs = {k: v for name in names for k, v in FILTERS[name].items()}
+            filters = CarFilter(**kwargs)
+            result = timed(lambda: uncached(filters), repeat)
+            result["results"] = len(car_service.search_cars(filters, 10))
+            search["+".join(names) or "none"] = result
+    cached = timed(lambda: car_service.search_cars(CarFilter(**FILTERS["make"]), 10), repeat)
+
+    fuzzy = {
+        name: timed(lambda: uncached(CarFilter(**kwargs)), repeat)
+        for name, kwargs in FUZZY_QUERIES.items()
+    }
+
+    rng = np.random.default_rng(seed)
+    cars = car_service.get_all_cars()
+    ids = [cars[i].stock_id for i in rng.integers(len(cars), size=1000)]
+    by_id = timed(lambda: [car_service.get_car_by_id(stock_id) for stock_id in ids], repeat)
+    by_id = {key: round(value / len(ids), 3) for key, value in by_id.items()}
+
+    stats = timed(lambda: (
+        car_service.get_price_range(),
+        car_service.get_popular_makes(),
+        len(car_service.get_all_cars())
+    ), repeat)
+
+    return {
+        "rows": rows,
+        "load_seconds": round(load_seconds, 3),
+        "memory": {
+            "rss_delta_bytes": rss_after - rss_before,
+            "dataframe_bytes": int(car_service.df.memory_usage(deep=True).sum()),
+        },
+        "search_cars": search,
+        "search_cars_cached": cached,
+        "fuzzy_resolution": fuzzy,
+        "get_car_by_id_per_call": by_id,
+        "stats_aggregates": stats,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "kavak-bench"))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": [bench_size(rows, args.seed, args.repeat, args.cache_dir) for rows in args.rows],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
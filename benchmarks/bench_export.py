@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Memory and throughput of the /cars/export stream over a synthetic catalog.
+
+Drives the same chunk generator the endpoint hands to StreamingResponse and
+samples RSS after every chunk. With bounded memory the RSS stays flat after
+the catalog is loaded; --materialized measures the /cars?limit=N path for
+comparison, which grows with the number of rows.
+
+    python benchmarks/bench_export.py --rows 1000000 --format ndjson csv --gzip
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_car_service import catalog_path, git_commit, rss_bytes
+from src.models.car import CarFilter
+from src.services import catalog_export, json_encoding
+from src.services.car_service import CarService
+
+
+def bench_export(car_service: CarService, export_format: str, gzip: bool, chunk_size: int) -> dict:
+    gc.collect()
+    baseline = rss_bytes()
+    samples = []
+    total_bytes = 0
+    lines = 0
+
+    def counted(chunks):
+        nonlocal lines
+        for chunk in chunks:
+            lines += chunk.count(b"\n")
+            yield chunk
+
+    started = time.perf_counter()
+    chunks = counted(catalog_export.iter_export(car_service, CarFilter(), export_format, chunk_size))
+    if gzip:
+        chunks = catalog_export.gzip_chunks(chunks)
+    for chunk in chunks:
+        total_bytes += len(chunk)
+        samples.append(rss_bytes())
+    seconds = time.perf_counter() - started
+
+    # Drop the first few samples: allocator warm-up, not growth with the result
+    steady = samples[len(samples) // 10:] or samples
+    return {
+        "format": export_format,
+        "gzip": gzip,
+        "chunk_size": chunk_size,
+        "rows": lines - 1 if export_format == "csv" else lines,
+        "bytes": total_bytes,
+        "seconds": round(seconds, 3),
+        "rss_baseline_bytes": baseline,
+        "rss_peak_delta_bytes": max(samples) - baseline,
+        "rss_steady_spread_bytes": max(steady) - min(steady),
+    }
+
+
+def bench_materialized(car_service: CarService, rows: int) -> dict:
+    """What /cars?limit=<rows> holds in memory before sending the body"""
+    gc.collect()
+    baseline = rss_bytes()
+    started = time.perf_counter()
+    fragments = car_service.search_cars_json(CarFilter(), rows)
+    body = json_encoding.join_object(
+        cars=json_encoding.join_array(fragments),
+        count=json_encoding.dumps(len(fragments))
+    )
+    peak = rss_bytes()
+    seconds = time.perf_counter() - started
+    result = {
+        "rows": len(fragments),
+        "bytes": len(body),
+        "seconds": round(seconds, 3),
+        "rss_peak_delta_bytes": peak - baseline,
+    }
+    del fragments, body
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", nargs="+", default=["ndjson", "csv"], choices=sorted(catalog_export.EXPORT_MEDIA_TYPES))
+    parser.add_argument("--gzip", action="store_true", help="also measure each format gzipped")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--materialized", action="store_true", help="also measure the /cars?limit=N path")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "kavak-bench"))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    car_service = CarService(catalog_path(args.rows, args.seed, args.cache_dir))
+    load_seconds = time.perf_counter() - started
+
+    results = []
+    for export_format in args.format:
+        for gzip in ([False, True] if args.gzip else [False]):
+            results.append(bench_export(car_service, export_format, gzip, args.chunk_size))
+
+    report = {
+        "commit": git_commit(),
+        "rows": args.rows,
+        "seed": args.seed,
+        "load_seconds": round(load_seconds, 3),
+        "export": results,
+    }
+    if args.materialized:
+        report["materialized"] = bench_materialized(car_service, args.rows)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Response-building throughput: Pydantic serialization vs pre-encoded fragments.
+
+Builds the /cars body both ways for several `limit` values over a catalog
+made of the sample rows repeated with fresh stock ids, and prints one JSON
+line per limit.
+
+    python benchmarks/bench_serialization.py --rows 20000 --limits 10 100 1000 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.models.car import CarFilter
+from src.services import json_encoding
+from src.services.car_service import CarService
+
+SAMPLE_CSV = os.path.join(ROOT, 'data', 'sample_caso_ai_engineer.csv')
+
+
+def _catalog(rows: int) -> CarService:
+    sample = pd.read_csv(SAMPLE_CSV)
+    df = sample.sample(n=rows, replace=True, random_state=0).reset_index(drop=True)
+    df['stock_id'] = range(1, rows + 1)
+    path = os.path.join(tempfile.mkdtemp(), 'catalog.csv')
+    df.to_csv(path, index=False)
+    return CarService(path)
+
+
+def _time(fn, min_seconds: float = 0.5) -> float:
+    calls, started = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    car_service = _catalog(args.rows)
+    filters = CarFilter()
+
+    for limit in args.limits:
+        def pydantic_body():
+            cars = car_service.search_cars(filters, limit)
+            return JSONResponse(content=jsonable_encoder({"cars": cars, "count": len(cars)})).body
+
+        def fragment_body():
+            fragments = car_service.search_cars_json(filters, limit)
+            return json_encoding.join_object(
+                cars=json_encoding.join_array(fragments),
+                count=json_encoding.dumps(len(fragments))
+            )
+
+        assert pydantic_body() == fragment_body()
+        pydantic_rps, fragment_rps = _time(pydantic_body), _time(fragment_body)
+        print(json.dumps({
+            "rows": args.rows,
+            "limit": limit,
+            "pydantic_per_second": round(pydantic_rps, 1),
+            "fragments_per_second": round(fragment_rps, 1),
+            "speedup": round(fragment_rps / pydantic_rps, 2),
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
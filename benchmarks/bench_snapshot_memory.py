@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Per-worker memory of CarService loaded from a shared catalog snapshot.
+
+Builds a snapshot of a synthetic catalog, then starts one process per
+worker that loads CarService.from_snapshot, runs a few searches, lookups and
+aggregates, and reports how its memory grew, split into private anonymous
+memory (heap, never shared) and file-backed pages (the mapped snapshot,
+shared through the page cache by every worker). Linux only (reads
+/proc/self/smaps_rollup).
+
+    python benchmarks/bench_snapshot_memory.py --rows 200000 --workers 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_car_service import catalog_path, git_commit
+
+
+def memory_kib() -> dict:
+    """Resident memory of this process split into anonymous and file-backed KiB"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"anonymous": fields["Anonymous"], "file_backed": fields["Rss"] - fields["Anonymous"]}
+
+
+def worker(snapshot_dir: str, queue):
+    import gc
+    from src.models.car import CarFilter
+    from src.services.car_service import CarService
+
+    gc.collect()
+    before = memory_kib()
+    started = time.perf_counter()
+    car_service = CarService.from_snapshot(snapshot_dir)
+    load_seconds = time.perf_counter() - started
+
+    # Touch every column the way live traffic does
+    for filters in [CarFilter(), CarFilter(make="toyot", max_price=400000), CarFilter(q="automatico 4x4")]:
+        car_service.search_cars(filters, 20)
+    car_service.get_popular_makes()
+    car_service.get_price_range()
+    cars = car_service.search_cars(CarFilter(), 100)
+    for car in cars:
+        car_service.get_car_by_id(car.stock_id)
+        car_service.get_car_json(car.stock_id)
+
+    gc.collect()
+    after = memory_kib()
+    queue.put({
+        "pid": os.getpid(),
+        "load_seconds": round(load_seconds, 3),
+        "private_mib": round((after["anonymous"] - before["anonymous"]) / 1024, 1),
+        "shared_mapped_mib": round((after["file_backed"] - before["file_backed"]) / 1024, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "kavak-bench"))
+    args = parser.parse_args()
+
+    from src.services.catalog_snapshot import build_snapshot
+    snapshot_dir = build_snapshot(
+        catalog_path(args.rows, args.seed, args.cache_dir),
+        os.path.join(tempfile.mkdtemp(prefix="kavak-snapshot-"), "catalog")
+    )
+
+    # Spawned, like uvicorn workers, so nothing is inherited from this process
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    results = []
+    for _ in range(args.workers):
+        process = context.Process(target=worker, args=(snapshot_dir, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(json.dumps({"commit": git_commit(), "rows": args.rows, "workers": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
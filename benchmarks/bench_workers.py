@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Throughput of the API versus uvicorn worker count.
+
+Starts `python main.py` with WEB_CONCURRENCY=N for each requested N, drives
+/cars with concurrent clients for a fixed duration and prints one JSON line
+per worker count. Workers only add throughput up to the number of CPUs, which
+every line records; results from a run are kept in benchmarks/results/.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_CSV = os.path.join(ROOT, 'data', 'sample_caso_ai_engineer.csv')
+PATHS = [
+    "/cars?make=Toyota&limit=5",
+    "/cars?max_price=400000&min_year=2018&limit=20",
+    "/cars?monthly_payment=8000&limit=10",
+    "/stats",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+def run(workers: int, clients: int, duration: float, csv_path: str) -> dict:
+    port = _free_port()
+    runtime_dir = tempfile.mkdtemp(prefix="kavak-bench-")
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        CATALOG_CSV_PATH=csv_path,
+        KAVAK_RUNTIME_DIR=runtime_dir,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "bench"),
+        TWILIO_ACCOUNT_SID=os.getenv("TWILIO_ACCOUNT_SID", "bench"),
+        TWILIO_AUTH_TOKEN=os.getenv("TWILIO_AUTH_TOKEN", "bench"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        counts = [0] * clients
+        errors = [0] * clients
+        stop = time.time() + duration
+
+        def client(i: int):
+            with httpx.Client(base_url=base_url, timeout=10.0) as http:
+                n = 0
+                while time.time() < stop:
+                    response = http.get(PATHS[n % len(PATHS)])
+                    if response.status_code == 200:
+                        counts[i] += 1
+                    else:
+                        errors[i] += 1
+                    n += 1
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        started = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - started
+        return {
+            "workers": workers,
+            "cpus": os.cpu_count(),
+            "clients": clients,
+            "requests": sum(counts),
+            "errors": sum(errors),
+            "seconds": round(elapsed, 2),
+            "requests_per_second": round(sum(counts) / elapsed, 1),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        print(json.dumps(run(workers, args.clients, args.duration, os.path.abspath(args.csv))), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic catalogs with the same schema as the sample CSV.
+
+Prices follow the make/model's new price, depreciated by age and mileage;
+mileage grows with age; newer cars carry CarPlay more often. A small share
+of rows gets typo'd make/model spellings and missing dimensions, as in the
+raw inventory.
+
+    python benchmarks/catalog_generator.py --rows 1000000 --output /tmp/catalog_1m.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["stock_id", "km", "price", "make", "model", "year", "version",
+           "bluetooth", "largo", "ancho", "altura", "car_play"]
+
+# make -> (market share weight, [(model, new price MXN, (largo, ancho, altura))])
+CATALOG = {
+    "Nissan": (0.14, [("Versa", 330000, (4495, 1740, 1465)), ("Sentra", 420000, (4641, 1815, 1447)),
+                      ("March", 280000, (3827, 1665, 1528)), ("Kicks", 450000, (4295, 1760, 1590)),
+                      ("X-Trail", 620000, (4680, 1840, 1725))]),
+    "Chevrolet": (0.12, [("Aveo", 290000, (4399, 1735, 1475)), ("Onix", 330000, (4474, 1730, 1471)),
+                         ("Cavalier", 360000, (4544, 1779, 1493)), ("Trax", 430000, (4270, 1776, 1674)),
+                         ("Equinox", 620000, (4652, 1843, 1661))]),
+    "Volkswagen": (0.11, [("Vento", 320000, (4390, 1699, 1467)), ("Jetta", 470000, (4702, 1799, 1458)),
+                          ("Polo", 330000, (4053, 1751, 1461)), ("Tiguan", 650000, (4701, 1839, 1674)),
+                          ("Touareg", 1300000, (4878, 1984, 1717))]),
+    "Toyota": (0.10, [("Yaris", 330000, (4425, 1730, 1475)), ("Corolla", 450000, (4630, 1780, 1435)),
+                      ("RAV4", 650000, (4600, 1855, 1685)), ("Hilux", 560000, (5330, 1855, 1815))]),
+    "KIA": (0.09, [("Rio", 330000, (4385, 1725, 1460)), ("Forte", 420000, (4640, 1800, 1440)),
+                   ("Seltos", 480000, (4370, 1800, 1620)), ("Sportage", 620000, (4515, 1865, 1645))]),
+    "Mazda": (0.09, [("Mazda 2", 330000, (4320, 1695, 1470)), ("Mazda 3", 470000, (4660, 1795, 1440)),
+                     ("CX-3", 430000, (4275, 1765, 1535)), ("CX-5", 620000, (4550, 1840, 1680))]),
+    "Honda": (0.08, [("City", 360000, (4553, 1748, 1467)), ("Civic", 520000, (4678, 1802, 1415)),
+                     ("HR-V", 480000, (4330, 1790, 1605)), ("CR-V", 650000, (4635, 1855, 1680))]),
+    "Ford": (0.06, [("Figo", 270000, (3886, 1695, 1525)), ("EcoSport", 380000, (4096, 1765, 1653)),
+                    ("Escape", 590000, (4585, 1882, 1678)), ("Ranger", 600000, (5354, 1850, 1815))]),
+    "Hyundai": (0.05, [("Accent", 310000, (4385, 1729, 1470)), ("Creta", 430000, (4300, 1790, 1635)),
+                       ("Tucson", 620000, (4500, 1865, 1650))]),
+    "Renault": (0.04, [("Kwid", 230000, (3731, 1579, 1474)), ("Duster", 380000, (4341, 1804, 1682)),
+                       ("Koleos", 600000, (4672, 1843, 1678))]),
+    "Seat": (0.03, [("Ibiza", 330000, (4059, 1780, 1447)), ("León", 480000, (4368, 1800, 1456)),
+                    ("Ateca", 560000, (4381, 1841, 1615))]),
+    "BMW": (0.03, [("Serie 1", 650000, (4319, 1799, 1434)), ("Serie 3", 900000, (4709, 1827, 1442)),
+                   ("X1", 850000, (4447, 1821, 1598)), ("X5", 1700000, (4922, 2004, 1745))]),
+    "Mercedes Benz": (0.03, [("Clase A", 700000, (4419, 1796, 1440)), ("Clase C", 950000, (4686, 1810, 1442)),
+                             ("GLA", 850000, (4410, 1834, 1611))]),
+    "Audi": (0.02, [("A3", 650000, (4343, 1785, 1458)), ("Q3", 800000, (4484, 1849, 1616)),
+                    ("Q5", 1100000, (4663, 1893, 1659))]),
+    "Land Rover": (0.01, [("Discovery Sport", 1100000, (4599, 2069, 1724)),
+                          ("Range Rover Evoque", 1200000, (4371, 1904, 1649))]),
+}
+
+ENGINES = ["1.0", "1.2", "1.4", "1.5", "1.6", "1.8", "2.0", "2.4", "2.5", "3.0", "3.5"]
+TRIMS = ["SENSE", "ADVANCE", "EXCLUSIVE", "LX", "EX", "LT", "LTZ", "S", "SPORT", "LIMITED",
+         "COMFORTLINE", "TRENDLINE", "HIGHLINE", "I SPORT", "I GRAND TOURING", "HSE", "PRIME"]
+TRANSMISSIONS = ["AUTO", "AT", "CVT", "DCT", "MT", "TIPTRONIC", "STD"]
+TRANSMISSION_WEIGHTS = [0.30, 0.20, 0.18, 0.08, 0.16, 0.04, 0.04]
+DRIVETRAINS = ["", " 4WD", " AWD", " 2WD", " TDI"]
+DRIVETRAIN_WEIGHTS = [0.80, 0.07, 0.06, 0.05, 0.02]
+CURRENT_YEAR = 2024
+
+
+def _typo(words: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Upper-case, drop a letter or swap two letters, like hand-typed inventory"""
+    out = []
+    for word, kind, position in zip(words, rng.integers(0, 3, len(words)), rng.random(len(words))):
+        i = int(position * (len(word) - 2)) + 1
+        if kind == 0:
+            out.append(word.upper())
+        elif kind == 1:
+            out.append(word[:i] + word[i + 1:])
+        else:
+            out.append(word[:i - 1] + word[i] + word[i - 1] + word[i + 1:])
+    return np.array(out, dtype=object)
+
+
+def generate_catalog(rows: int, seed: int = 0, start_id: int = 100000,
+                     typo_rate: float = 0.01, missing_rate: float = 0.02) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    makes = list(CATALOG)
+    weights = np.array([CATALOG[m][0] for m in makes])
+    make_idx = rng.choice(len(makes), size=rows, p=weights / weights.sum())
+
+    # Flatten (make, model) pairs so model choice is one vectorized draw per make
+    model_make, model_name, model_price, model_dims = [], [], [], []
+    for i, make in enumerate(makes):
+        for name, price, dims in CATALOG[make][1]:
+            model_make.append(i)
+            model_name.append(name)
+            model_price.append(price)
+            model_dims.append(dims)
+    model_make = np.array(model_make)
+    model_idx = np.empty(rows, dtype=np.int64)
+    for i in range(len(makes)):
+        rows_i = np.flatnonzero(make_idx == i)
+        candidates = np.flatnonzero(model_make == i)
+        model_idx[rows_i] = rng.choice(candidates, size=len(rows_i))
+
+    age = np.minimum(rng.gamma(shape=2.0, scale=2.2, size=rows).astype(np.int64), 12)
+    year = CURRENT_YEAR - 1 - age
+    km = np.maximum(rng.normal(15000, 5000, rows) * (age + rng.random(rows)), 500).astype(np.int64)
+
+    new_price = np.array(model_price, dtype=float)[model_idx]
+    depreciation = 0.88 ** age * (1 - np.minimum(km, 250000) / 1_000_000)
+    price = new_price * depreciation * rng.lognormal(0, 0.08, rows)
+    price = np.maximum(np.round(price / 1000) * 1000 - 1, 59999).astype(float)
+
+    version = (
+        np.array(ENGINES, dtype=object)[rng.integers(0, len(ENGINES), rows)] + " "
+        + np.array(TRIMS, dtype=object)[rng.integers(0, len(TRIMS), rows)] + " "
+        + np.array(TRANSMISSIONS, dtype=object)[rng.choice(len(TRANSMISSIONS), rows, p=TRANSMISSION_WEIGHTS)]
+        + np.array(DRIVETRAINS, dtype=object)[rng.choice(len(DRIVETRAINS), rows, p=DRIVETRAIN_WEIGHTS)]
+    )
+
+    dims = np.array(model_dims, dtype=float)[model_idx] + rng.normal(0, 5, (rows, 3)).round()
+    dims[rng.random((rows, 3)) < missing_rate] = np.nan
+
+    make = np.array(makes, dtype=object)[make_idx]
+    model = np.array(model_name, dtype=object)[model_idx]
+    typo_make = rng.random(rows) < typo_rate
+    typo_model = rng.random(rows) < typo_rate
+    make[typo_make] = _typo(make[typo_make], rng)
+    model[typo_model] = _typo(model[typo_model], rng)
+
+    bluetooth = np.where(rng.random(rows) < 0.95, "Sí", None)
+    car_play = np.where(rng.random(rows) < np.clip((10 - age) / 10, 0.05, 0.9), "Sí", None)
+
+    return pd.DataFrame({
+        "stock_id": start_id + rng.permutation(rows),
+        "km": km,
+        "price": price,
+        "make": make,
+        "model": model,
+        "year": year,
+        "version": version,
+        "bluetooth": bluetooth,
+        "largo": dims[:, 0],
+        "ancho": dims[:, 1],
+        "altura": dims[:, 2],
+        "car_play": car_play,
+    }, columns=COLUMNS)
+
+
+def write_catalog(path: str, rows: int, seed: int = 0, chunk_size: int = 1_000_000) -> str:
+    """Write a catalog CSV chunk by chunk so 10M-row files fit in modest memory"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        while written < rows:
+            size = min(chunk_size, rows - written)
+            chunk = generate_catalog(size, seed=seed + written, start_id=100000 + written)
+            # Chunk ids are permuted within disjoint ranges, so they stay unique
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += size
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+    write_catalog(args.output, args.rows, args.seed)
+    print(args.output)
+
+
+if __name__ == "__main__":
+    main()
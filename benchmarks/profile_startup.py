@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Cold-start profile of the API: import cost of main.py and init cost of each service.
+
+Runs a fresh interpreter with `-X importtime`, imports main, then builds each
+service in dependency order and prints a JSON report. Exits non-zero when a
+budget is exceeded, so it can gate CI.
+
+    python benchmarks/profile_startup.py --max-import-seconds 1.5 --max-service-seconds 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_CSV = os.path.join(ROOT, 'data', 'sample_caso_ai_engineer.csv')
+
+# Modules that must not be imported just to serve /health
+HEAVY_MODULES = ["pandas", "numpy", "fuzzywuzzy", "Levenshtein", "openai", "twilio"]
+SERVICE_ORDER = ["car_service", "financing_service", "llm_service", "whatsapp_service"]
+
+
+def _child():
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import main
+    import_seconds = time.perf_counter() - started
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    services = {}
+    for name in SERVICE_ORDER:
+        service = main.services[name]
+        try:
+            service.get()
+        except Exception:
+            pass
+        services[name] = service.status()
+
+    print(json.dumps({
+        "import_main_seconds": import_seconds,
+        "heavy_modules_after_import": heavy,
+        "services": services,
+    }))
+
+
+def _parse_importtime(stderr: str, top: int) -> list:
+    """Top-level imports and their direct imports, sorted by cumulative time"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # importtime indents nested imports by two extra spaces per level
+        if name.startswith("     "):
+            continue
+        rows.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    rows.sort(key=lambda row: row["cumulative_us"], reverse=True)
+    return rows[:top]
+
+
+def profile_startup(top: int = 15) -> dict:
+    env = dict(os.environ)
+    env.setdefault("CATALOG_CSV_PATH", DEFAULT_CSV)
+    env.setdefault("OPENAI_API_KEY", "profile")
+    env.setdefault("TWILIO_ACCOUNT_SID", "profile")
+    env.setdefault("TWILIO_AUTH_TOKEN", "profile")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["slowest_imports"] = _parse_importtime(result.stderr, top)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-import-seconds", type=float)
+    parser.add_argument("--max-service-seconds", type=float)
+    args = parser.parse_args()
+
+    if args.child:
+        _child()
+        return
+
+    report = profile_startup(args.top)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["heavy_modules_after_import"]:
+        failures.append(f"heavy modules imported by main: {report['heavy_modules_after_import']}")
+    if args.max_import_seconds and report["import_main_seconds"] > args.max_import_seconds:
+        failures.append(f"import main took {report['import_main_seconds']:.2f}s")
+    for name, status in report["services"].items():
+        if status["error"]:
+            failures.append(f"{name} failed: {status['error']}")
+        elif args.max_service_seconds and status["init_seconds"] > args.max_service_seconds:
+            failures.append(f"{name} took {status['init_seconds']:.2f}s")
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,141 @@
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import Response
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Form, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import threading
 from dotenv import load_dotenv
-from src.services.car_service import CarService
-from src.services.financing_service import FinancingService
-from src.services.llm_service import LLMService
-from src.services.whatsapp_service import WhatsAppService
-from src.models.car import CarFilter, FinancingRequest
+from src.services import catalog_export, json_encoding
+from src.services.lazy import LazyService
+from src.models.car import CarFilter, FinancingRequest, AffordabilityQuery
+
+# Service modules pull in pandas, fuzzywuzzy, openai and twilio, so they are
+# imported inside the factories below and only paid for on first use (or by
+# the warm-up task), keeping /health fast on a cold start
 
 load_dotenv()
 
-app = FastAPI(title="Kavak Bot API", version="1.0.0")
+
+def _is_worker_process() -> bool:
+    """One of several server processes: WEB_CONCURRENCY > 1, a uvicorn --workers child or a gunicorn worker"""
+    import multiprocessing
+    return (int(os.getenv("WEB_CONCURRENCY", 1)) > 1
+            or multiprocessing.parent_process() is not None
+            or os.getenv("SERVER_SOFTWARE", "").startswith("gunicorn"))
+
+
+# With several workers, however they are launched, every worker shares one
+# catalog snapshot (built by whichever worker gets there first) and one
+# session database, so a Twilio retry can land on any of them
+CATALOG_CSV_PATH = os.getenv("CATALOG_CSV_PATH", "sample_caso_ai_engineer.csv")
+RUNTIME_DIR = os.getenv("KAVAK_RUNTIME_DIR", ".kavak_runtime")
+SHARED_STATE = _is_worker_process()
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR") or (
+    os.path.join(RUNTIME_DIR, "catalog") if SHARED_STATE else None
+)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH") or (
+    os.path.join(RUNTIME_DIR, "sessions.db") if SHARED_STATE else None
+)
+# Seconds to wait for follow-up WhatsApp messages before answering; 0 disables
+WHATSAPP_COALESCE_SECONDS = float(os.getenv("WHATSAPP_COALESCE_SECONDS", 1.5))
+# Build every service in the background at startup; 0 defers each one to first use
+WARMUP = os.getenv("KAVAK_WARMUP", "1") == "1"
+
+
+def _build_car_service():
+    from src.services.car_service import CarService
+    if CATALOG_SNAPSHOT_DIR:
+        from src.services.catalog_snapshot import ensure_snapshot
+        return CarService.from_snapshot(ensure_snapshot(CATALOG_CSV_PATH, CATALOG_SNAPSHOT_DIR))
+    return CarService(CATALOG_CSV_PATH)
+
+
+def _build_financing_service():
+    from src.services.financing_service import FinancingService
+    return FinancingService()
+
+
+def _build_llm_service():
+    from src.services.llm_service import LLMService
+    return LLMService(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        car_service=get_car_service(),
+        financing_service=get_financing_service()
+    )
+
+
+def _build_whatsapp_service():
+    from src.services.whatsapp_service import WhatsAppService
+    from src.services.session_store import SQLiteSessionStore
+    from src.services.message_coalescer import MessageCoalescer
+    from src.services.turn_cache import SQLiteTurnDeduplicator
+    if SESSION_DB_PATH:
+        os.makedirs(os.path.dirname(os.path.abspath(SESSION_DB_PATH)), exist_ok=True)
+    return WhatsAppService(
+        account_sid=os.getenv("TWILIO_ACCOUNT_SID", ""),
+        auth_token=os.getenv("TWILIO_AUTH_TOKEN", ""),
+        phone_number=os.getenv("TWILIO_PHONE_NUMBER", ""),
+        session_store=SQLiteSessionStore(SESSION_DB_PATH) if SESSION_DB_PATH else None,
+        deduplicator=SQLiteTurnDeduplicator(SESSION_DB_PATH) if SESSION_DB_PATH else None,
+        coalescer=MessageCoalescer(WHATSAPP_COALESCE_SECONDS) if WHATSAPP_COALESCE_SECONDS > 0 else None
+    )
+
+
+services = {
+    "car_service": LazyService("car_service", _build_car_service),
+    "financing_service": LazyService("financing_service", _build_financing_service),
+    "llm_service": LazyService("llm_service", _build_llm_service),
+    "whatsapp_service": LazyService("whatsapp_service", _build_whatsapp_service),
+}
+
+
+def get_car_service():
+    return services["car_service"].get()
+
+
+def get_financing_service():
+    return services["financing_service"].get()
+
+
+def get_llm_service():
+    return services["llm_service"].get()
+
+
+def get_whatsapp_service():
+    return services["whatsapp_service"].get()
+
+
+def warm_up():
+    """Initialize every service; failures are kept in the service status for /ready"""
+    for service in services.values():
+        try:
+            service.get()
+        except Exception as e:
+            print(f"Error initializing {service.name}: {e}")
+
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def start_warm_up():
+    """Run warm_up in a background thread unless one is already running"""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None or not _warm_up_thread.is_alive():
+            _warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_up_thread.start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Not waited for: the server starts answering /health while services build
+    if WARMUP:
+        start_warm_up()
+    yield
+
+
+app = FastAPI(title="Kavak Bot API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,18 +144,6 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-car_service = CarService("sample_caso_ai_engineer.csv")
-financing_service = FinancingService()
-llm_service = LLMService(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    car_service=car_service,
-    financing_service=financing_service
-)
-whatsapp_service = WhatsAppService(
-    account_sid=os.getenv("TWILIO_ACCOUNT_SID", ""),
-    auth_token=os.getenv("TWILIO_AUTH_TOKEN", ""),
-    phone_number=os.getenv("TWILIO_PHONE_NUMBER", "")
-)
 
 
 @app.get("/")
@@ -41,11 +153,30 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up, whether or not services are initialized"""
     return {"status": "healthy", "service": "Kavak Bot"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: every service is initialized and requests will not pay for a cold start.
+
+    A probe that finds services missing starts building them, so with
+    KAVAK_WARMUP=0 a readiness-gated deployment still becomes ready without
+    first receiving traffic (and a failed build is retried).
+    """
+    statuses = {name: service.status() for name, service in services.items()}
+    ready = all(status["ready"] for status in statuses.values())
+    if not ready:
+        start_warm_up()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "services": statuses}
+    )
+
+
 @app.post("/chat")
-async def chat_endpoint(request: dict):
+async def chat_endpoint(request: dict, llm_service=Depends(get_llm_service)):
     try:
         message = request.get("message", "")
         if not message:
@@ -62,13 +193,17 @@ async def whatsapp_webhook(
     request: Request,
     Body: str = Form(...),
     From: str = Form(...),
-    To: str = Form(...)
+    To: str = Form(...),
+    MessageSid: str = Form(None),
+    whatsapp_service=Depends(get_whatsapp_service),
+    llm_service=Depends(get_llm_service)
 ):
     try:
-        phone_number = whatsapp_service.handle_incoming_message(From, Body)
-        history = whatsapp_service.get_conversation_history(phone_number)
-        response = llm_service.process_message(Body, history[:-1])
-        whatsapp_service.add_assistant_message(phone_number, response)
+        # Coalescing and retry waits are coroutines; the model call runs on the
+        # service's own executor
+        response = await whatsapp_service.respond(From, Body, MessageSid, llm_service.process_message)
+        if response is None:
+            return Response(content=whatsapp_service.create_empty_response(), media_type="application/xml")
         twiml_response = whatsapp_service.create_webhook_response(response)
         return Response(content=twiml_response, media_type="application/xml")
     except Exception as e:
@@ -78,6 +213,14 @@ async def whatsapp_webhook(
         return Response(content=error_response, media_type="application/xml")
 
 
+@app.get("/whatsapp/stats")
+async def get_whatsapp_stats(whatsapp_service=Depends(get_whatsapp_service)):
+    """LLM calls saved by merging rapid-fire messages; totals only, since sessions are phone numbers"""
+    if whatsapp_service.coalescer is None:
+        return {"error": "Coalescing disabled"}
+    return whatsapp_service.coalescer.totals()
+
+
 @app.get("/cars")
 async def get_cars(
     make: str = None,
@@ -87,9 +230,17 @@ async def get_cars(
     max_km: int = None,
     min_year: int = None,
     max_year: int = None,
-    limit: int = 10
+    q: str = None,
+    monthly_payment: float = None,
+    down_payment: float = None,
+    down_payment_pct: float = None,
+    min_years: int = 3,
+    max_years: int = 6,
+    limit: int = 10,
+    car_service=Depends(get_car_service),
+    financing_service=Depends(get_financing_service)
 ):
-    """Get cars with filters"""
+    """Get cars with filters, optionally by maximum monthly payment"""
     try:
         filters = CarFilter(
             make=make,
@@ -98,21 +249,80 @@ async def get_cars(
             max_price=max_price,
             max_km=max_km,
             min_year=min_year,
-            max_year=max_year
+            max_year=max_year,
+            q=q
         )
-        cars = car_service.search_cars(filters, limit)
-        return {"cars": cars, "count": len(cars)}
+        if monthly_payment is not None:
+            query = AffordabilityQuery(
+                monthly_payment=monthly_payment,
+                down_payment=down_payment,
+                down_payment_pct=down_payment_pct,
+                min_years=min_years,
+                max_years=max_years
+            )
+            # Each car next to the plan that fits the budget
+            results = car_service.search_affordable_cars(filters, query, financing_service, limit)
+            return {"results": results, "count": len(results)}
+        # Assembled from the catalog's pre-encoded cars instead of letting
+        # FastAPI re-validate and re-serialize every Car
+        fragments = car_service.search_cars_json(filters, limit)
+        content = json_encoding.join_object(
+            cars=json_encoding.join_array(fragments),
+            count=json_encoding.dumps(len(fragments))
+        )
+        return Response(content=content, media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.get("/cars/export")
+async def export_cars(
+    request: Request,
+    make: str = None,
+    model: str = None,
+    min_price: float = None,
+    max_price: float = None,
+    max_km: int = None,
+    min_year: int = None,
+    max_year: int = None,
+    q: str = None,
+    export_format: str = Query("ndjson", alias="format"),
+    car_service=Depends(get_car_service)
+):
+    """Stream every matching car as NDJSON or CSV, gzipped when the client accepts it"""
+    try:
+        filters = CarFilter(
+            make=make,
+            model=model,
+            min_price=min_price,
+            max_price=max_price,
+            max_km=max_km,
+            min_year=min_year,
+            max_year=max_year,
+            q=q
+        )
+        chunks = catalog_export.iter_export(car_service, filters, export_format)
+    except Exception as e:
+        return {"error": str(e)}
+    
+    headers = {
+        "Content-Disposition": f'attachment; filename="cars.{export_format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if catalog_export.accepts_gzip(request.headers.get("accept-encoding", "")):
+        chunks = catalog_export.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    # A sync iterator, so Starlette encodes each chunk in the threadpool
+    return StreamingResponse(chunks, media_type=catalog_export.EXPORT_MEDIA_TYPES[export_format], headers=headers)
+
+
 @app.get("/cars/{stock_id}")
-async def get_car_details(stock_id: str):
+async def get_car_details(stock_id: str, car_service=Depends(get_car_service)):
     """Get specific car details"""
     try:
-        car = car_service.get_car_by_id(stock_id)
-        if car:
-            return {"car": car}
+        fragment = car_service.get_car_json(stock_id)
+        if fragment:
+            return Response(content=json_encoding.join_object(car=fragment), media_type="application/json")
         else:
             return {"error": "Car not found"}
     except Exception as e:
@@ -120,7 +330,7 @@ async def get_car_details(stock_id: str):
 
 
 @app.post("/financing/calculate")
-async def calculate_financing(request: FinancingRequest):
+async def calculate_financing(request: FinancingRequest, financing_service=Depends(get_financing_service)):
     """Calculate financing plan"""
     try:
         plan = financing_service.calculate_financing(request)
@@ -130,7 +340,11 @@ async def calculate_financing(request: FinancingRequest):
 
 
 @app.get("/financing/options")
-async def get_financing_options(car_price: float, down_payment: float = None):
+async def get_financing_options(
+    car_price: float,
+    down_payment: float = None,
+    financing_service=Depends(get_financing_service)
+):
     """Get multiple financing options"""
     try:
         options = financing_service.get_financing_options(car_price, down_payment)
@@ -140,23 +354,38 @@ async def get_financing_options(car_price: float, down_payment: float = None):
 
 
 @app.get("/stats")
-async def get_stats():
+async def get_stats(car_service=Depends(get_car_service)):
     """Get catalog statistics"""
     try:
         price_range = car_service.get_price_range()
         popular_makes = car_service.get_popular_makes()
         total_cars = len(car_service.get_all_cars())
         
-        return {
+        content = json_encoding.dumps({
             "total_cars": total_cars,
             "price_range": price_range,
             "popular_makes": popular_makes
-        }
+        })
+        return Response(content=content, media_type="application/json")
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.get("/stats/cache")
+async def get_cache_stats(car_service=Depends(get_car_service)):
+    """Search result cache hit rate and size"""
+    return car_service.search_cache_info()
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Built here so no worker waits on the snapshot lock; the workers find
+        # it through WEB_CONCURRENCY, which they inherit
+        from src.services.catalog_snapshot import ensure_snapshot
+        ensure_snapshot(CATALOG_CSV_PATH, CATALOG_SNAPSHOT_DIR)
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -1,6 +1,11 @@
 from pydantic import BaseModel, field_validator
 from typing import Optional, Union
-import pandas as pd
+import math
+
+
+def _is_missing(v) -> bool:
+    # Same cases as pd.isna for CSV cells, without importing pandas with the models
+    return v is None or (isinstance(v, float) and math.isnan(v))
 
 
 class Car(BaseModel):
@@ -25,14 +30,14 @@ class Car(BaseModel):
     @field_validator('car_play', 'bluetooth', 'version', mode='before')
     @classmethod
     def validate_optional_strings(cls, v):
-        if pd.isna(v) or v == '' or str(v).lower() == 'nan':
+        if _is_missing(v) or v == '' or str(v).lower() == 'nan':
             return None
         return str(v)
 
     @field_validator('largo', 'ancho', 'altura', mode='before')
     @classmethod
     def validate_optional_floats(cls, v):
-        if pd.isna(v) or str(v).lower() == 'nan':
+        if _is_missing(v) or str(v).lower() == 'nan':
             return None
         try:
             return float(v)
@@ -48,6 +53,15 @@ class CarFilter(BaseModel):
     max_km: Optional[int] = None
     min_year: Optional[int] = None
     max_year: Optional[int] = None
+    q: Optional[str] = None  # free text over make, model and version
+
+
+class AffordabilityQuery(BaseModel):
+    monthly_payment: float
+    down_payment: Optional[float] = None
+    down_payment_pct: Optional[float] = None  # 0-100, defaults to 20% when no down payment is given
+    min_years: int = 3
+    max_years: int = 6
 
 
 class FinancingRequest(BaseModel):
@@ -64,4 +78,9 @@ class FinancingPlan(BaseModel):
     monthly_payment: float
     total_payment: float
     total_interest: float
-    interest_rate: float = 0.10
\ No newline at end of file
+    interest_rate: float = 0.10
+
+
+class AffordableCar(BaseModel):
+    car: Car
+    financing_plan: FinancingPlan
@@ -1,31 +1,272 @@
+import numpy as np
 import pandas as pd
-from typing import List, Optional
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
 from fuzzywuzzy import fuzz, process
-from ..models.car import Car, CarFilter
+from ..models.car import Car, CarFilter, AffordabilityQuery, AffordableCar
+from .financing_service import FinancingService
+from .catalog_snapshot import load_snapshot
+from .catalog_rows import CatalogRows, StockIdIndex
+from .search_index import CatalogSearchIndex
+from .result_cache import LRUCache
+
+# Common shorthands that fuzzy matching alone cannot resolve
+MAKE_ALIASES = {
+    "vw": "Volkswagen",
+    "chevy": "Chevrolet",
+    "mercedes": "Mercedes Benz",
+    "benz": "Mercedes Benz",
+    "mb": "Mercedes Benz",
+    "range rover": "Land Rover",
+}
+
+
+class _Catalog(NamedTuple):
+    """Everything derived from one catalog load, swapped in as a single reference"""
+    version: int
+    df: pd.DataFrame
+    cars: CatalogRows
+    positions: StockIdIndex
+    search_index: CatalogSearchIndex
+    doc_ids: np.ndarray
 
 
 class CarService:
+    SEARCH_CACHE_SIZE = 1024
+    
     def __init__(self, csv_path: str):
-        self.df = pd.read_csv(csv_path)
-        self.cars = [Car(**row.to_dict()) for _, row in self.df.iterrows()]
+        self._source = lambda: pd.read_csv(csv_path)
+        self.catalog_version = 0
+        self._search_cache = LRUCache(self.SEARCH_CACHE_SIZE)
+        self._name_cache = LRUCache(self.SEARCH_CACHE_SIZE)
+        self._load(self._source())
+    
+    @classmethod
+    def from_snapshot(cls, snapshot_dir: str) -> "CarService":
+        """Build the service over a memory-mapped catalog snapshot shared between workers"""
+        service = cls.__new__(cls)
+        service._source = lambda: load_snapshot(snapshot_dir)
+        service.catalog_version = 0
+        service._search_cache = LRUCache(cls.SEARCH_CACHE_SIZE)
+        service._name_cache = LRUCache(cls.SEARCH_CACHE_SIZE)
+        service._load(service._source())
+        return service
+    
+    def reload(self):
+        """Re-read the catalog from its source and rebuild every derived structure"""
+        self._load(self._source())
+    
+    def _load(self, df: pd.DataFrame):
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            df = df.reset_index(drop=True)
+        
+        # Text columns as categoricals: one copy of each distinct string, and in
+        # snapshot mode the codes stay in the shared mapping
+        for name in ('make', 'model', 'version'):
+            if not isinstance(df[name].dtype, pd.CategoricalDtype):
+                df[name] = df[name].astype('category')
+        for name in df.columns:
+            if df[name].dtype == object:
+                df[name] = df[name].astype('category')
+        
+        # Rows are addressed by position; each Car and its JSON fragment are
+        # built on first use and kept in a bounded cache
+        cars = CatalogRows(df)
+        positions = StockIdIndex(df['stock_id'])
+        search_index, doc_ids = self._build_search_index(df)
+        pairs = df[['make', 'model']].dropna().drop_duplicates()
+        models_by_make = {
+            make: group['model'].astype(str).tolist() for make, group in pairs.groupby('make', observed=True)
+        }
+        
+        self.df, self.cars = df, cars
+        self._makes = df['make'].cat.categories.astype(str).tolist()
+        self._models = df['model'].cat.categories.astype(str).tolist()
+        self._models_by_make = models_by_make
+        self._popular_makes = None
+        # Cached results and name resolutions belong to the previous catalog
+        self._search_cache.clear()
+        self._name_cache.clear()
+        self.catalog_version += 1
+        # Readers take this once per call, so they never mix two catalogs
+        self._catalog = _Catalog(self.catalog_version, df, cars, positions, search_index, doc_ids)
     
-    def get_all_cars(self) -> List[Car]:
+    @staticmethod
+    def _build_search_index(df: pd.DataFrame) -> Tuple[CatalogSearchIndex, np.ndarray]:
+        """Index each distinct make/model/version once; returns the row → document map"""
+        columns = [df[name].cat for name in ('make', 'model', 'version')]
+        sizes = [len(column.categories) + 1 for column in columns]
+        key = np.zeros(len(df), dtype=np.int64)
+        for column, size in zip(columns, sizes):
+            key = key * size + column.codes.to_numpy().astype(np.int64) + 1
+        doc_ids, unique_keys = pd.factorize(key)
+        
+        parts = []
+        for column, size in reversed(list(zip(columns, sizes))):
+            codes = unique_keys % size - 1
+            unique_keys = unique_keys // size
+            values = np.append(np.array(column.categories, dtype=object), '')
+            parts.append(values[codes])
+        make, model, version = reversed(parts)
+        documents = [f"{a} {b} {c}" for a, b, c in zip(make, model, version)]
+        return CatalogSearchIndex(documents, np.bincount(doc_ids)), doc_ids.astype(np.int32)
+    
+    @staticmethod
+    def _text_scores(catalog: _Catalog, q: str) -> np.ndarray:
+        """BM25 score of every catalog row"""
+        return catalog.search_index.scores(q)[catalog.doc_ids]
+    
+    def get_all_cars(self) -> Sequence[Car]:
         return self.cars
     
     def search_cars(self, filters: CarFilter, limit: int = 10) -> List[Car]:
-        filtered_df = self.df.copy()
+        catalog = self._catalog
+        return [catalog.cars[i] for i in self._search_positions(catalog, filters, limit)]
+    
+    def search_cars_json(self, filters: CarFilter, limit: int = 10) -> List[bytes]:
+        """Same results as search_cars, as pre-encoded JSON fragments"""
+        catalog = self._catalog
+        return [catalog.cars.fragment(i) for i in self._search_positions(catalog, filters, limit)]
+    
+    def iter_export(self, filters: CarFilter, chunk_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """Every matching row in catalog order, filtered one slice at a time.
         
-        if filters.make:
-            makes = filtered_df['make'].unique()
-            best_match = process.extractOne(filters.make, makes, scorer=fuzz.ratio)
+        Unlike search_cars this never materializes the full result, so memory
+        stays bounded by `chunk_size` whatever the number of matches. The
+        catalog is captured when this is called, so a reload() mid-stream
+        does not mix rows from two catalogs.
+        """
+        return (chunk for chunk, _ in self._export_chunks(filters, chunk_size))
+    
+    def iter_export_json(self, filters: CarFilter, chunk_size: int = 10000) -> Iterator[List[bytes]]:
+        """Same rows as iter_export, as the JSON of their cars encoded from the columns (not cached)"""
+        return (cars.fragments(chunk.index) for chunk, cars in self._export_chunks(filters, chunk_size))
+    
+    def _export_chunks(self, filters: CarFilter, chunk_size: int) -> Iterator[Tuple[pd.DataFrame, CatalogRows]]:
+        catalog = self._catalog
+        filters = self._resolve_filters(filters)
+        # BM25 is scored once over the whole catalog (one float per row)
+        scores = self._text_scores(catalog, filters.q) if filters.q else None
+        
+        def chunks():
+            df = catalog.df
+            for start in range(0, len(df), chunk_size):
+                chunk = self._apply_filters(filters, df.iloc[start:start + chunk_size], scores)
+                if len(chunk):
+                    yield chunk.drop(columns='_score', errors='ignore'), catalog.cars
+        return chunks()
+    
+    def search_cache_info(self) -> dict:
+        return {**self._search_cache.info(), "catalog_version": self.catalog_version}
+    
+    def _search_positions(self, catalog: _Catalog, filters: CarFilter, limit: int) -> Tuple[int, ...]:
+        """Positions in `catalog`; a result computed while reload() swaps the
+        catalog is cached under the old version, which no lookup asks for again"""
+        filters = self._resolve_filters(filters)
+        sort = 'relevance' if filters.q else 'price'
+        # Resolved names and canonical query terms, so "vw" and "Volkswagen" or
+        # "4x4 diesel" and "Diésel 4WD" share an entry
+        key = (
+            catalog.version, filters.make, filters.model,
+            filters.min_price or None, filters.max_price or None, filters.max_km or None,
+            filters.min_year or None, filters.max_year or None,
+            CatalogSearchIndex.terms(filters.q) if filters.q else None,
+            limit, sort
+        )
+        positions = self._search_cache.get(key)
+        if positions is not None:
+            return positions
+        
+        filtered_df = self._apply_filters(filters, catalog=catalog)
+        if sort == 'relevance':
+            # Best text match first, cheapest first among equal matches
+            filtered_df = filtered_df.sort_values(['_score', 'price'], ascending=[False, True])
+        else:
+            filtered_df = filtered_df.sort_values('price')
+        positions = tuple(filtered_df.index[:limit].tolist())
+        self._search_cache.put(key, positions)
+        return positions
+    
+    def search_affordable_cars(
+        self,
+        filters: CarFilter,
+        query: AffordabilityQuery,
+        financing_service: FinancingService,
+        limit: int = 10
+    ) -> List[AffordableCar]:
+        """Cars whose cheapest plan fits the monthly budget, with that plan attached"""
+        years, max_prices = financing_service.max_prices_by_term(query)
+        catalog = self._catalog
+        filtered_df = self._apply_filters(self._resolve_filters(filters), catalog=catalog)
+        prices = filtered_df['price'].to_numpy(dtype=float)
+        
+        # Ceilings grow with the term, so the first term whose ceiling covers the
+        # price is the shortest (and cheapest in total interest) qualifying plan
+        term_idx = np.searchsorted(max_prices, prices, side='left')
+        mask = term_idx < len(years)
+        if query.down_payment is not None:
+            mask &= prices > query.down_payment
+        
+        filtered_df = filtered_df[mask].assign(_term_idx=term_idx[mask])
+        filtered_df = filtered_df.sort_values('price').head(limit)
+        
+        prices = filtered_df['price'].to_numpy(dtype=float)
+        if query.down_payment is not None:
+            down_payments = np.full(len(prices), query.down_payment)
+        else:
+            down_payment_pct = 20.0 if query.down_payment_pct is None else query.down_payment_pct
+            down_payments = prices * down_payment_pct / 100
+        plans = financing_service.build_plans(
+            prices, down_payments, years[filtered_df['_term_idx'].to_numpy()]
+        )
+        
+        cars = [catalog.cars[i] for i in filtered_df.index]
+        return [AffordableCar(car=car, financing_plan=plan) for car, plan in zip(cars, plans)]
+    
+    def _filter(self, filters: CarFilter) -> pd.DataFrame:
+        return self._apply_filters(self._resolve_filters(filters))
+    
+    def _resolve_filters(self, filters: CarFilter) -> CarFilter:
+        """Replace typed make/model with exact catalog names (None when nothing matches)"""
+        if not filters.make and not filters.model:
+            return filters
+        key = (self.catalog_version, filters.make, filters.model)
+        resolved = self._name_cache.get(key)
+        if resolved is None:
+            resolved = self._resolve_names(filters.make, filters.model)
+            self._name_cache.put(key, resolved)
+        return filters.model_copy(update={'make': resolved[0], 'model': resolved[1]})
+    
+    def _resolve_names(self, make: Optional[str], model: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        resolved_make = resolved_model = None
+        
+        if make:
+            alias = MAKE_ALIASES.get(make.strip().lower())
+            if alias in self._makes:
+                resolved_make = alias
+            else:
+                best_match = process.extractOne(make, self._makes, scorer=fuzz.ratio)
+                if best_match and best_match[1] >= 70:
+                    resolved_make = best_match[0]
+        
+        if model:
+            models = self._models_by_make[resolved_make] if resolved_make else self._models
+            best_match = process.extractOne(model, models, scorer=fuzz.ratio)
             if best_match and best_match[1] >= 70:
-                filtered_df = filtered_df[filtered_df['make'] == best_match[0]]
+                resolved_model = best_match[0]
+        
+        return resolved_make, resolved_model
+    
+    def _apply_filters(self, filters: CarFilter, df: pd.DataFrame = None,
+                       scores: np.ndarray = None, catalog: _Catalog = None) -> pd.DataFrame:
+        if catalog is None:
+            catalog = self._catalog
+        filtered_df = catalog.df if df is None else df
+        
+        if filters.make:
+            filtered_df = filtered_df[filtered_df['make'] == filters.make]
         
         if filters.model:
-            models = filtered_df['model'].unique()
-            best_match = process.extractOne(filters.model, models, scorer=fuzz.ratio)
-            if best_match and best_match[1] >= 70:
-                filtered_df = filtered_df[filtered_df['model'] == best_match[0]]
+            filtered_df = filtered_df[filtered_df['model'] == filters.model]
         
         if filters.min_price:
             filtered_df = filtered_df[filtered_df['price'] >= filters.min_price]
@@ -42,18 +283,30 @@ class CarService:
         if filters.max_year:
             filtered_df = filtered_df[filtered_df['year'] <= filters.max_year]
         
-        filtered_df = filtered_df.sort_values('price')
+        if filters.q:
+            if scores is None:
+                scores = self._text_scores(catalog, filters.q)
+            scores = scores[filtered_df.index.to_numpy()]
+            filtered_df = filtered_df[scores > 0].assign(_score=scores[scores > 0])
         
-        return [Car(**row.to_dict()) for _, row in filtered_df.head(limit).iterrows()]
+        return filtered_df
     
     def get_car_by_id(self, stock_id: str) -> Optional[Car]:
-        car_data = self.df[self.df['stock_id'] == stock_id]
-        if not car_data.empty:
-            return Car(**car_data.iloc[0].to_dict())
-        return None
+        catalog = self._catalog
+        position = catalog.positions.position(stock_id)
+        return catalog.cars[position] if position is not None else None
+    
+    def get_car_json(self, stock_id: str) -> Optional[bytes]:
+        catalog = self._catalog
+        position = catalog.positions.position(stock_id)
+        return catalog.cars.fragment(position) if position is not None else None
     
     def get_popular_makes(self) -> List[str]:
-        return self.df['make'].value_counts().head(10).index.tolist()
+        if self._popular_makes is None:
+            # Counted on plain strings: a categorical breaks ties by category
+            # order instead of first appearance, which reorders equal counts
+            self._popular_makes = self.df['make'].astype(object).value_counts().head(10).index.tolist()
+        return self._popular_makes
     
     def get_price_range(self) -> dict:
         return {
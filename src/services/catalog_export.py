@@ -0,0 +1,68 @@
+import zlib
+from typing import Iterable, Iterator
+from ..models.car import CarFilter
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def iter_export(car_service, filters: CarFilter, export_format: str = "ndjson",
+                chunk_size: int = 10000) -> Iterator[bytes]:
+    """Encoded export of every car matching `filters`, one chunk of rows at a time"""
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Formato no soportado: {export_format}. Usa ndjson o csv")
+    if export_format == "csv":
+        return _csv_chunks(car_service.iter_export(filters, chunk_size), car_service.df.columns)
+    return _ndjson_chunks(car_service.iter_export_json(filters, chunk_size))
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values ("gzip;q=0" refuses it)"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+
+def _ndjson_chunks(chunks) -> Iterator[bytes]:
+    # One pre-encoded car per line, byte-identical to the items of /cars
+    for fragments in chunks:
+        yield b"".join(fragment + b"\n" for fragment in fragments)
+
+
+def _csv_chunks(chunks, columns) -> Iterator[bytes]:
+    # Same columns and order as the catalog CSV; the header goes out even
+    # when nothing matches
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+    if header:
+        yield (",".join(columns) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream into one gzip member without buffering it"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,192 @@
+import math
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from ..models.car import Car
+from .result_cache import LRUCache
+from . import json_encoding
+
+# How Car validates each field, mirrored by the column-wise encoder
+FIELD_KINDS = {
+    "stock_id": "id", "km": "int", "price": "float", "make": "str", "model": "str", "year": "int",
+    "version": "optional_str", "bluetooth": "optional_str", "car_play": "optional_str",
+    "largo": "optional_float", "ancho": "optional_float", "altura": "optional_float",
+}
+
+
+class CatalogRows(Sequence):
+    """Cars of a catalog frame addressed by position, validated and encoded on first use.
+
+    Reads straight from the frame's column arrays (memory-mapped ones in
+    snapshot mode) instead of materializing a Car per row, so a worker keeps
+    only the recently used cars and their JSON fragments in its own heap.
+    """
+
+    CACHE_SIZE = 4096
+
+    def __init__(self, df: pd.DataFrame, cache_size: int = CACHE_SIZE):
+        self._length = len(df)
+        self._columns = []
+        for name in df.columns:
+            values = df[name]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories = np.array(values.cat.categories, dtype=object)
+                self._columns.append((name, values.cat.codes.to_numpy(), categories))
+            else:
+                self._columns.append((name, values.to_numpy(), None))
+        self._cars = LRUCache(cache_size)
+        self._fragments = LRUCache(cache_size)
+        self._tables: Dict[str, Optional[np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._length))]
+        position = self._check(position)
+        car = self._cars.get(position)
+        if car is None:
+            car = Car(**self.record(position))
+            self._cars.put(position, car)
+        return car
+
+    def record(self, position: int) -> Dict:
+        """Raw column values of one row as native Python objects"""
+        record = {}
+        for name, values, categories in self._columns:
+            if categories is None:
+                record[name] = values[position].item()
+            else:
+                code = values[position]
+                record[name] = categories[code] if code >= 0 else None
+        return record
+
+    def fragment(self, position: int, cache: bool = True) -> bytes:
+        """JSON of one car, byte-identical to FastAPI's rendering of the Car"""
+        position = self._check(position)
+        fragment = self._fragments.get(position) if cache else None
+        if fragment is None:
+            car = self._cars.get(position) or Car(**self.record(position))
+            fragment = json_encoding.dumps(car.model_dump(mode='json'))
+            if cache:
+                self._fragments.put(position, fragment)
+        return fragment
+
+    def fragments(self, positions: Iterable[int]) -> List[bytes]:
+        """JSON of the cars at `positions`, same bytes as fragment(), encoded a column at a time.
+
+        Each distinct text value is encoded once and numeric columns in one
+        call per column, instead of validating a Car per row. Rows the
+        encoder does not cover (a value Car would coerce or reject) go
+        through fragment() instead.
+        """
+        positions = np.fromiter((self._check(i) for i in positions), dtype=np.int64)
+        if not len(positions):
+            return []
+        columns = {name: (values, categories) for name, values, categories in self._columns}
+        encoded = []
+        for name in Car.model_fields:
+            if name in columns:
+                values, categories = columns[name]
+                items = self._encode_column(name, values, categories, positions)
+            else:
+                items = [self._encode_value(FIELD_KINDS[name], None)] * len(positions)
+            if items is None or None in items:
+                return [self.fragment(i, cache=False) for i in positions]
+            key = json_encoding.dumps(name) + b":"
+            encoded.append([key + item for item in items])
+        return [b"{" + b",".join(row) + b"}" for row in zip(*encoded)]
+
+    def _encode_column(self, name: str, values: np.ndarray, categories: Optional[np.ndarray],
+                       positions: np.ndarray) -> Optional[List[Optional[bytes]]]:
+        kind = FIELD_KINDS[name]
+        if categories is not None:
+            if name not in self._tables:
+                # The last entry is code -1, a missing value
+                table = [self._encode_value(kind, value) for value in categories]
+                self._tables[name] = np.array(table + [self._encode_value(kind, None)], dtype=object)
+            return self._tables[name][values[positions]].tolist()
+        chunk = values[positions]
+        if chunk.dtype.kind not in "iuf":
+            return None
+        if kind in ("int", "float", "optional_float"):
+            if kind == "int":
+                if chunk.dtype.kind == "f":
+                    if not np.all(np.mod(chunk, 1) == 0):
+                        return None
+                    chunk = chunk.astype(np.int64)
+                items = chunk.tolist()
+            else:
+                chunk = chunk.astype(float)
+                missing = np.isnan(chunk)
+                if kind == "float" and missing.any():
+                    return None
+                items = chunk.tolist()
+                for i in np.flatnonzero(missing):
+                    items[i] = None
+            # Numbers and null never contain a comma, so one encode splits cleanly
+            return json_encoding.dumps(items)[1:-1].split(b",")
+        return [self._encode_value(kind, value) for value in chunk.tolist()]
+
+    @staticmethod
+    def _encode_value(kind: str, value) -> Optional[bytes]:
+        """JSON of one value as Car would validate and dump it; None when Car would coerce or reject it"""
+        missing = value is None or (isinstance(value, float) and math.isnan(value))
+        if kind == "id":
+            return json_encoding.dumps(str(value))
+        if kind == "str":
+            return json_encoding.dumps(value) if isinstance(value, str) else None
+        if kind == "optional_str":
+            if missing or value == '' or str(value).lower() == 'nan':
+                return b"null"
+            return json_encoding.dumps(str(value))
+        if kind == "optional_float":
+            if missing or str(value).lower() == 'nan':
+                return b"null"
+            try:
+                return json_encoding.dumps(float(value))
+            except (ValueError, TypeError):
+                return b"null"
+        return None
+
+    def _check(self, position) -> int:
+        position = int(position)
+        if position < 0:
+            position += self._length
+        if not 0 <= position < self._length:
+            raise IndexError("catalog position out of range")
+        return position
+
+
+class StockIdIndex:
+    """stock_id → row position through a sorted permutation (4 bytes per row, no dict)"""
+
+    def __init__(self, stock_ids: pd.Series):
+        if isinstance(stock_ids.dtype, pd.CategoricalDtype):
+            self._categories: Optional[pd.Index] = stock_ids.cat.categories.astype(str)
+            self._keys = stock_ids.cat.codes.to_numpy()
+        else:
+            self._categories = None
+            self._keys = stock_ids.to_numpy()
+        self._order = np.argsort(self._keys, kind='stable').astype(np.int32)
+
+    def position(self, stock_id: str) -> Optional[int]:
+        stock_id = str(stock_id)
+        if self._categories is not None:
+            key = self._categories.get_indexer([stock_id])[0]
+            if key < 0:
+                return None
+        else:
+            try:
+                key = self._keys.dtype.type(stock_id)
+            except (ValueError, OverflowError):
+                return None
+            # "007" or "7.0" must not match the catalog's "7"
+            if str(key.item()) != stock_id:
+                return None
+        i = np.searchsorted(self._keys, key, sorter=self._order)
+        if i < len(self._order) and self._keys[self._order[i]] == key:
+            return int(self._order[i])
+        return None
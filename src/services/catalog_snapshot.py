@@ -0,0 +1,99 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+META_FILE = "meta.json"
+
+
+def build_snapshot(csv_path: str, snapshot_dir: str) -> str:
+    """Parse the catalog CSV once and write it as memory-mappable column files.
+
+    Numeric columns are stored as raw .npy arrays. Text columns are stored as
+    categorical codes (in the integer width pandas itself uses, so they can be
+    wrapped without a copy) plus their unique values, so workers only keep one
+    copy of each distinct string.
+    """
+    df = pd.read_csv(csv_path)
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_numeric_dtype(values):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values.to_numpy())
+            columns.append({"name": name, "kind": "numeric"})
+        else:
+            categorical = pd.Categorical(values)
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), categorical.codes)
+            columns.append({"name": name, "kind": "text", "values": [str(v) for v in categorical.categories]})
+
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump({
+            "rows": len(df),
+            "source": os.path.abspath(csv_path),
+            "source_mtime": os.path.getmtime(csv_path),
+            "columns": columns,
+        }, f)
+
+    # Swap the finished snapshot in so readers never see a partial directory
+    if os.path.isdir(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    return snapshot_dir
+
+
+def ensure_snapshot(csv_path: str, snapshot_dir: str) -> str:
+    """Build the snapshot unless an up-to-date one exists, once across processes.
+
+    Every worker can call this on startup: the first one builds while the
+    others wait on a lock file next to the snapshot, then find it current.
+    An existing snapshot is kept when the CSV is not available.
+    """
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    with open(os.path.abspath(snapshot_dir) + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not _is_current(csv_path, snapshot_dir):
+            build_snapshot(csv_path, snapshot_dir)
+    return snapshot_dir
+
+
+def _is_current(csv_path: str, snapshot_dir: str) -> bool:
+    try:
+        with open(os.path.join(snapshot_dir, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return (meta.get("source") == os.path.abspath(csv_path)
+            and meta.get("source_mtime") == os.path.getmtime(csv_path))
+
+
+def load_snapshot(snapshot_dir: str) -> pd.DataFrame:
+    """Open a snapshot read-only; every column stays backed by the shared page cache.
+
+    Text columns come back as categoricals whose codes are the mapped arrays,
+    so only the distinct strings are held in each worker's own memory.
+    """
+    with open(os.path.join(snapshot_dir, META_FILE)) as f:
+        meta = json.load(f)
+
+    data = {}
+    for column in meta["columns"]:
+        array = np.load(os.path.join(snapshot_dir, f"{column['name']}.npy"), mmap_mode="r")
+        if column["kind"] == "numeric":
+            data[column["name"]] = array
+        else:
+            # Code -1 is a missing value
+            data[column["name"]] = pd.Categorical.from_codes(array, categories=column["values"], validate=False)
+
+    # copy=False keeps each memory-mapped array as its own block instead of
+    # consolidating (and copying) same-dtype columns
+    return pd.DataFrame(data, copy=False)
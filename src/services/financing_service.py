@@ -1,4 +1,6 @@
-from ..models.car import FinancingRequest, FinancingPlan
+import numpy as np
+from typing import List, Tuple
+from ..models.car import FinancingRequest, FinancingPlan, AffordabilityQuery
 
 
 class FinancingService:
@@ -57,4 +59,66 @@ class FinancingService:
             except ValueError:
                 continue
         
-        return options
\ No newline at end of file
+        return options
+    
+    def max_prices_by_term(self, query: AffordabilityQuery) -> Tuple[np.ndarray, np.ndarray]:
+        """Invert the annuity formula: highest car price payable per term for a monthly budget"""
+        if query.min_years < self.MIN_YEARS or query.max_years > self.MAX_YEARS or query.min_years > query.max_years:
+            raise ValueError(f"El plazo debe ser entre {self.MIN_YEARS} y {self.MAX_YEARS} años")
+        
+        if query.monthly_payment <= 0:
+            raise ValueError("El pago mensual debe ser mayor a cero")
+        
+        if query.down_payment is not None and query.down_payment < 0:
+            raise ValueError("El enganche no puede ser negativo")
+        
+        down_payment_pct = 20.0 if query.down_payment_pct is None else query.down_payment_pct
+        if down_payment_pct < 0 or down_payment_pct >= 100:
+            raise ValueError("El porcentaje de enganche debe ser entre 0 y 100")
+        
+        years = np.arange(query.min_years, query.max_years + 1)
+        monthly_rate = self.INTEREST_RATE / 12
+        num_payments = years * 12
+        max_loan = query.monthly_payment * (1 - (1 + monthly_rate) ** -num_payments) / monthly_rate
+        
+        if query.down_payment is not None:
+            max_prices = max_loan + query.down_payment
+        else:
+            max_prices = max_loan / (1 - down_payment_pct / 100)
+        
+        return years, max_prices
+    
+    def build_plans(self, car_prices: np.ndarray, down_payments: np.ndarray, years: np.ndarray) -> List[FinancingPlan]:
+        """Vectorized equivalent of calculate_financing for already validated inputs"""
+        car_prices = np.asarray(car_prices, dtype=float)
+        down_payments = np.asarray(down_payments, dtype=float)
+        years = np.asarray(years)
+        
+        loan_amounts = car_prices - down_payments
+        monthly_rate = self.INTEREST_RATE / 12
+        num_payments = years * 12
+        growth = (1 + monthly_rate) ** num_payments
+        monthly_payments = np.where(
+            loan_amounts > 0,
+            loan_amounts * (monthly_rate * growth) / (growth - 1),
+            0.0
+        )
+        total_payments = monthly_payments * num_payments + down_payments
+        total_interests = total_payments - car_prices
+        
+        return [
+            FinancingPlan(
+                car_price=float(price),
+                down_payment=float(down),
+                loan_amount=float(loan),
+                years=int(term),
+                monthly_payment=round(float(monthly), 2),
+                total_payment=round(float(total), 2),
+                total_interest=round(float(interest), 2),
+                interest_rate=self.INTEREST_RATE
+            )
+            for price, down, loan, term, monthly, total, interest in zip(
+                car_prices, down_payments, loan_amounts, years,
+                monthly_payments, total_payments, total_interests
+            )
+        ]
@@ -0,0 +1,34 @@
+import json
+from typing import Any, Iterable
+
+try:
+    import orjson
+except ImportError:  # optional accelerator, falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode like FastAPI's JSONResponse (compact separators, raw UTF-8).
+
+    orjson only differs from the stdlib on exponent-formatted floats
+    (1e16 vs 1e+16), which catalog prices and dimensions never reach.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def join_array(fragments: Iterable[bytes]) -> bytes:
+    """Assemble already-encoded JSON values into a JSON array"""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def join_object(**fields: bytes) -> bytes:
+    """Assemble already-encoded JSON values into a JSON object, keeping field order"""
+    return b"{" + b",".join(dumps(key) + b":" + value for key, value in fields.items()) + b"}"
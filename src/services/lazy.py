@@ -0,0 +1,39 @@
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyService(Generic[T]):
+    """Build a service on first use (or from a warm-up hook), exactly once across threads"""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self.init_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    try:
+                        instance = self.factory()
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.init_seconds = time.perf_counter() - started
+                    self.error = None
+                    self._instance = instance
+        return self._instance
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "init_seconds": self.init_seconds, "error": self.error}
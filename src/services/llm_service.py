@@ -1,18 +1,36 @@
 import openai
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 import json
-from ..models.car import Car, CarFilter
+from ..models.car import Car, CarFilter, AffordabilityQuery
 from ..services.car_service import CarService
 from ..services.financing_service import FinancingService
+from .model_tiering import ModelTier, ModelUnavailableError, TieredCompletions, default_tiers, default_turn_timeout
+from .tool_memory import ToolMemory
+
+UNAVAILABLE_MESSAGE = "Lo siento, en este momento estoy tardando más de lo normal. ¿Me repites tu mensaje en un momento?"
 
 
 class LLMService:
-    def __init__(self, api_key: str, car_service: CarService, financing_service: FinancingService):
-        self.client = openai.OpenAI(api_key=api_key)
+    # Messages past this size are answered by the strong tier
+    COMPLEX_MESSAGE_CHARS = 200
+    
+    def __init__(self, api_key: str, car_service: CarService, financing_service: FinancingService,
+                 tiers: List[ModelTier] = None, client=None, turn_timeout_seconds: float = None):
+        # Retries are handled by hedging and tier fallback instead of the SDK
+        self.client = client if client is not None else openai.AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.completions = TieredCompletions(self.client, tiers or default_tiers())
+        self.turn_timeout_seconds = turn_timeout_seconds if turn_timeout_seconds is not None else default_turn_timeout()
         self.car_service = car_service
         self.financing_service = financing_service
         self.system_prompt = self._build_system_prompt()
     
+    def _select_tier(self, user_message: str) -> str:
+        """Tier that writes the reply to this message; function selection always uses the fast tier"""
+        if len(user_message) >= self.COMPLEX_MESSAGE_CHARS:
+            return "strong"
+        return "fast"
+    
     def _build_system_prompt(self) -> str:
         return """Eres un agente comercial de Kavak México. Ayudas a los clientes a encontrar autos y calcular financiamiento.
 
@@ -27,7 +45,8 @@ INFORMACIÓN SOBRE KAVAK:
 CAPACIDADES:
 1. Buscar autos según preferencias del cliente
 2. Calcular planes de financiamiento (tasa 10% anual, 3-6 años)
-3. Información sobre Kavak y proceso de compra
+3. Buscar autos que quepan en un pago mensual
+4. Información sobre Kavak y proceso de compra
 
 INSTRUCCIONES:
 - Sé amigable y profesional
@@ -36,17 +55,27 @@ INSTRUCCIONES:
 - Mantén respuestas concisas
 
 HERRAMIENTAS:
-- search_cars: Buscar autos por criterios
+- search_cars: Buscar autos por criterios (usa monthly_payment si el cliente habla de mensualidades)
+- get_car_details: Detalles de un auto ya mostrado
 - calculate_financing: Calcular plan de financiamiento
 - get_financing_options: Obtener múltiples opciones de financiamiento
+- Si el cliente se refiere a un auto ya mostrado ("el segundo", "ese"), usa su `ordinal` en lugar de buscar de nuevo
 
 Responde en español mexicano con tono profesional pero cercano."""
 
-    def process_message(self, user_message: str, conversation_history: List[Dict] = None) -> str:
+    def process_message(self, user_message: str, conversation_history: List[Dict] = None,
+                        memory: Dict = None) -> str:
+        """Answer one turn; `memory` holds the session's recent tool results and is updated in place"""
+        # One budget for every model call of the turn, fallbacks included
+        deadline = time.monotonic() + self.turn_timeout_seconds
         if conversation_history is None:
             conversation_history = []
+        memory = ToolMemory(memory)
         
         messages = [{"role": "system", "content": self.system_prompt}]
+        memory_prompt = memory.prompt()
+        if memory_prompt:
+            messages.append({"role": "system", "content": memory_prompt})
         messages.extend(conversation_history)
         messages.append({"role": "user", "content": user_message})
         
@@ -65,21 +94,40 @@ Responde en español mexicano con tono profesional pero cercano."""
                         "max_km": {"type": "number", "description": "Kilómetros máximos"},
                         "min_year": {"type": "number", "description": "Año mínimo"},
                         "max_year": {"type": "number", "description": "Año máximo"},
+                        "q": {"type": "string", "description": "Texto libre sobre versión y equipamiento, p. ej. '4x4', 'automático', 'diésel', 'HSE'"},
+                        "monthly_payment": {"type": "number", "description": "Pago mensual máximo que el cliente puede pagar"},
+                        "down_payment": {"type": "number", "description": "Enganche en pesos (con monthly_payment)"},
+                        "down_payment_pct": {"type": "number", "description": "Enganche como porcentaje del precio, 0-100 (con monthly_payment, por defecto 20)"},
+                        "min_years": {"type": "number", "description": "Plazo mínimo en años (con monthly_payment, 3-6)"},
+                        "max_years": {"type": "number", "description": "Plazo máximo en años (con monthly_payment, 3-6)"},
                         "limit": {"type": "number", "description": "Número máximo de resultados", "default": 5}
                     }
                 }
             },
+            {
+                "name": "get_car_details",
+                "description": "Obtener los detalles de un auto ya mostrado o de un ID de stock",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "ordinal": {"type": "number", "description": "Número del auto en AUTOS MOSTRADOS"},
+                        "stock_id": {"type": "string", "description": "ID de stock del auto"}
+                    }
+                }
+            },
             {
                 "name": "calculate_financing",
                 "description": "Calcular plan de financiamiento para un auto",
                 "parameters": {
                     "type": "object",
                     "properties": {
+                        "ordinal": {"type": "number", "description": "Número del auto en AUTOS MOSTRADOS (en lugar de car_price)"},
+                        "stock_id": {"type": "string", "description": "ID de stock del auto (en lugar de car_price)"},
                         "car_price": {"type": "number", "description": "Precio del auto"},
-                        "down_payment": {"type": "number", "description": "Enganche"},
+                        "down_payment": {"type": "number", "description": "Enganche (por defecto 20% del precio)"},
                         "years": {"type": "number", "description": "Años de financiamiento (3-6)"}
                     },
-                    "required": ["car_price", "down_payment", "years"]
+                    "required": ["years"]
                 }
             },
             {
@@ -88,54 +136,103 @@ Responde en español mexicano con tono profesional pero cercano."""
                 "parameters": {
                     "type": "object",
                     "properties": {
+                        "ordinal": {"type": "number", "description": "Número del auto en AUTOS MOSTRADOS (en lugar de car_price)"},
+                        "stock_id": {"type": "string", "description": "ID de stock del auto (en lugar de car_price)"},
                         "car_price": {"type": "number", "description": "Precio del auto"},
                         "down_payment": {"type": "number", "description": "Enganche (opcional)"}
-                    },
-                    "required": ["car_price"]
+                    }
                 }
             }
         ]
         
+        tier = self._select_tier(user_message)
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-1106",
+            response = self.completions.create(
+                "fast",
+                deadline=deadline,
                 messages=messages,
                 functions=functions,
                 function_call="auto",
-                temperature=0.7,
-                max_tokens=1000
+                temperature=0.7
             )
             
             message = response.choices[0].message
             
             if message.function_call:
-                return self._handle_function_call(message, messages)
-            else:
+                return self._handle_function_call(message, messages, tier, memory, deadline)
+            if tier == "fast":
                 return message.content
-                
+            
+            # A complex message without a tool call gets the strong tier's
+            # answer; if it is unavailable the fast reply already in hand is used
+            try:
+                response = self.completions.create(tier, deadline=deadline, fallback=False,
+                                                   messages=messages, temperature=0.7)
+            except ModelUnavailableError:
+                return message.content
+            return response.choices[0].message.content
+        
+        except ModelUnavailableError:
+            return UNAVAILABLE_MESSAGE
         except Exception as e:
             return f"Lo siento, hubo un error procesando tu solicitud. Por favor intenta de nuevo. Error: {str(e)}"
     
-    def _handle_function_call(self, message, messages) -> str:
+    def _handle_function_call(self, message, messages, tier: str = "fast", memory: ToolMemory = None,
+                              deadline: float = None) -> str:
         function_name = message.function_call.name
         function_args = json.loads(message.function_call.arguments)
+        if memory is None:
+            memory = ToolMemory()
         
         try:
             if function_name == "search_cars":
                 filters = CarFilter(**function_args)
                 limit = function_args.get("limit", 5)
-                cars = self.car_service.search_cars(filters, limit)
-                result = self._format_car_results(cars)
+                if function_args.get("monthly_payment"):
+                    query = AffordabilityQuery(**function_args)
+                    results = self.car_service.search_affordable_cars(
+                        filters, query, self.financing_service, limit
+                    )
+                    memory.remember_cars([item.car for item in results], [item.financing_plan for item in results])
+                    result = self._format_affordable_results(results)
+                else:
+                    cars = self.car_service.search_cars(filters, limit)
+                    memory.remember_cars(cars)
+                    result = self._format_car_results(cars)
+            
+            elif function_name == "get_car_details":
+                car, ordinal = self._resolve_car(function_args, memory)
+                if car is None:
+                    raise ValueError("Indica el número del auto o su ID de stock")
+                if ordinal is not None:
+                    memory.focus(ordinal)
+                result = self._format_car_details(car)
                 
             elif function_name == "calculate_financing":
                 from ..models.car import FinancingRequest
-                request = FinancingRequest(**function_args)
+                car, ordinal = self._resolve_car(function_args, memory)
+                car_price = car.price if car is not None else function_args.get("car_price")
+                if car_price is None:
+                    raise ValueError("Indica el precio del auto o cuál de los autos mostrados financiar")
+                down_payment = function_args.get("down_payment")
+                if down_payment is None:
+                    down_payment = car_price * 0.20
+                request = FinancingRequest(car_price=car_price, down_payment=down_payment,
+                                           years=function_args["years"])
                 plan = self.financing_service.calculate_financing(request)
+                memory.remember_plan(plan, ordinal)
                 result = self._format_financing_plan(plan)
                 
             elif function_name == "get_financing_options":
+                car, ordinal = self._resolve_car(function_args, memory)
+                car_price = car.price if car is not None else function_args.get("car_price")
+                if car_price is None:
+                    raise ValueError("Indica el precio del auto o cuál de los autos mostrados financiar")
+                if ordinal is not None:
+                    memory.focus(ordinal)
                 options = self.financing_service.get_financing_options(
-                    function_args["car_price"],
+                    car_price,
                     function_args.get("down_payment")
                 )
                 result = self._format_financing_options(options)
@@ -155,19 +252,56 @@ Responde en español mexicano con tono profesional pero cercano."""
                 "content": result
             })
             
-            # Get final response from LLM
-            final_response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-1106",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000
-            )
+            # Get final response from LLM; if every tier times out the tool
+            # result itself is a usable (if less conversational) answer
+            try:
+                final_response = self.completions.create(
+                    tier,
+                    deadline=deadline,
+                    messages=messages,
+                    temperature=0.7
+                )
+            except ModelUnavailableError:
+                return result
             
             return final_response.choices[0].message.content
             
         except Exception as e:
             return f"Error procesando la función {function_name}: {str(e)}"
     
+    def _resolve_car(self, function_args: Dict, memory: ToolMemory) -> Tuple[Optional[Car], Optional[int]]:
+        """Car referenced by ordinal (from memory) or stock_id, with its ordinal if it was shown"""
+        stock_id = function_args.get("stock_id")
+        ordinal = function_args.get("ordinal")
+        if ordinal is not None:
+            entry = memory.car(int(ordinal))
+            if entry is None:
+                raise ValueError(f"No hay un auto número {ordinal} en los resultados recientes")
+            stock_id = entry["stock_id"]
+        if stock_id is None:
+            return None, None
+        
+        # Current price and details, even if the catalog changed since the search
+        car = self.car_service.get_car_by_id(str(stock_id))
+        if car is None:
+            raise ValueError(f"No encontré el auto con ID {stock_id}")
+        return car, memory.ordinal_of(car.stock_id)
+    
+    def _format_car_details(self, car: Car) -> str:
+        result = f"{car.year} {car.make} {car.model}\n"
+        if car.version:
+            result += f"Versión: {car.version}\n"
+        result += f"Precio: ${car.price:,.2f}\n"
+        result += f"Kilómetros: {car.km:,}\n"
+        if car.bluetooth:
+            result += f"Bluetooth: {car.bluetooth}\n"
+        if car.car_play:
+            result += f"CarPlay: {car.car_play}\n"
+        if car.largo and car.ancho and car.altura:
+            result += f"Dimensiones: {car.largo:,.0f} x {car.ancho:,.0f} x {car.altura:,.0f} mm\n"
+        result += f"ID: {car.stock_id}"
+        return result
+    
     def _format_car_results(self, cars: List[Car]) -> str:
         if not cars:
             return "No se encontraron autos que coincidan con los criterios especificados."
@@ -183,6 +317,21 @@ Responde en español mexicano con tono profesional pero cercano."""
         
         return result
     
+    def _format_affordable_results(self, results) -> str:
+        if not results:
+            return "No se encontraron autos cuyo pago mensual quepa en el presupuesto indicado."
+        
+        result = f"Encontré {len(results)} autos que caben en el presupuesto mensual:\n\n"
+        for i, item in enumerate(results, 1):
+            car, plan = item.car, item.financing_plan
+            result += f"{i}. {car.year} {car.make} {car.model}\n"
+            result += f"   Precio: ${car.price:,.2f}\n"
+            result += f"   Enganche: ${plan.down_payment:,.2f}\n"
+            result += f"   Pago mensual: ${plan.monthly_payment:,.2f} a {plan.years} años\n"
+            result += f"   ID: {car.stock_id}\n\n"
+        
+        return result
+    
     def _format_financing_plan(self, plan) -> str:
         return f"""Plan de Financiamiento:
 Precio del auto: ${plan.car_price:,.2f}
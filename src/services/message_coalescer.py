@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+class _Batch:
+    def __init__(self, now: float):
+        self.messages: List[str] = []
+        self.first_at = now
+        self.deadline = now
+        self.changed = asyncio.Event()
+
+    def touch(self):
+        # Wake every waiter to re-check the batch; later waiters use a fresh event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class MessageCoalescer:
+    """Merge rapid-fire messages from one phone into a single conversation turn.
+
+    Every message waits for a quiet window. A newer message from the same phone
+    takes over the batch and pushes the window out (never past max_wait_seconds
+    from the first message); the earlier calls return None and the last one
+    returns the merged text. A question or a long message closes the window
+    right away, since the customer is clearly waiting for an answer.
+
+    Waiting is a coroutine on the event loop, so pending batches hold no
+    threads. Batches live in this process only; in multi-worker mode messages
+    that land on different workers are answered separately. Per-session stats
+    expire after `stats_ttl_seconds` without messages and are capped at
+    `max_sessions`; the totals keep counting.
+    """
+
+    def __init__(self, window_seconds: float = 1.5, max_wait_seconds: float = None,
+                 long_message_chars: int = 80, stats_ttl_seconds: float = 3600,
+                 max_sessions: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else window_seconds * 3
+        self.long_message_chars = long_message_chars
+        self.stats_ttl_seconds = stats_ttl_seconds
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._batches: Dict[str, _Batch] = {}
+        self._stats: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._totals = {"messages": 0, "turns": 0}
+
+    async def submit(self, key: str, message: str) -> Optional[str]:
+        """Wait until the batch closes; the merged text if this call runs the turn, else None"""
+        now = time.monotonic()
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(now)
+        batch.messages.append(message)
+        position = len(batch.messages)
+        self._count(key, "messages")
+
+        if self._closes_window(message):
+            batch.deadline = now
+        else:
+            batch.deadline = min(now + self.window_seconds, batch.first_at + self.max_wait_seconds)
+        batch.touch()
+
+        while True:
+            if len(batch.messages) != position:
+                return None
+            remaining = batch.deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(batch.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._batches.get(key) is batch:
+            del self._batches[key]
+        self._count(key, "turns")
+        return "\n".join(batch.messages)
+
+    def _closes_window(self, message: str) -> bool:
+        text = message.strip()
+        return text.endswith("?") or len(text) >= self.long_message_chars
+
+    def _count(self, key: str, field: str):
+        now = self.clock()
+        # Least recently active sessions are at the front
+        while self._stats:
+            oldest, stats = next(iter(self._stats.items()))
+            if now - stats["last_seen"] < self.stats_ttl_seconds:
+                break
+            del self._stats[oldest]
+
+        stats = self._stats.pop(key, None) or {"messages": 0, "turns": 0}
+        stats[field] += 1
+        stats["last_seen"] = now
+        self._stats[key] = stats
+        self._totals[field] += 1
+        while len(self._stats) > self.max_sessions:
+            self._stats.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Messages received, turns run and LLM calls saved, per recent session and in total.
+
+        Sessions are keyed by phone number, so this is for in-process use;
+        anything public should use totals().
+        """
+        sessions = {
+            key: {
+                "messages": value["messages"],
+                "turns": value["turns"],
+                "llm_calls_saved": value["messages"] - value["turns"],
+            }
+            for key, value in self._stats.items()
+        }
+        return {"sessions": sessions, **self.totals()}
+
+    def totals(self) -> Dict:
+        """Messages, turns and LLM calls saved across every session, with no phone numbers"""
+        return {
+            "active_sessions": len(self._stats),
+            "messages": self._totals["messages"],
+            "turns": self._totals["turns"],
+            "llm_calls_saved": self._totals["messages"] - self._totals["turns"],
+        }
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import threading
+import time
+from asyncio import FIRST_COMPLETED
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import openai
+from pydantic import BaseModel
+
+
+class ModelTier(BaseModel):
+    name: str
+    model: str
+    timeout_seconds: float = 8.0
+    max_tokens: int = 1000
+
+
+class ModelUnavailableError(Exception):
+    """Every tier in the fallback chain timed out or failed"""
+
+
+def is_transient(error: Exception) -> bool:
+    """Timeouts, connection errors, 429 and 5xx; another tier may still answer"""
+    if isinstance(error, (TimeoutError, ConnectionError, openai.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def default_tiers() -> List[ModelTier]:
+    """Cheapest first; a tier falls back to the ones before it"""
+    timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", 8))
+    return [
+        ModelTier(name="fast", model=os.getenv("LLM_FAST_MODEL", "gpt-3.5-turbo-1106"), timeout_seconds=timeout),
+        ModelTier(name="strong", model=os.getenv("LLM_STRONG_MODEL", "gpt-4-1106-preview"), timeout_seconds=timeout),
+    ]
+
+
+def default_turn_timeout() -> float:
+    """Budget for all model calls of one turn; with up to 4.5 s of coalescing it fits Twilio's 15 s webhook window"""
+    return float(os.getenv("LLM_TURN_TIMEOUT_SECONDS", 10))
+
+
+class LatencyTracker:
+    """Rolling per-model latencies; the hedge deadline is their p95"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20,
+                 default_deadline: float = 4.0, min_deadline: float = 0.25):
+        self.window = window
+        self.min_samples = min_samples
+        self.default_deadline = default_deadline
+        self.min_deadline = min_deadline
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_deadline(self, model: str) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return self.default_deadline
+        return max(samples[int(0.95 * (len(samples) - 1))], self.min_deadline)
+
+
+class TieredCompletions:
+    """Chat completions with per-tier hedging, timeouts and fallback to cheaper tiers.
+
+    A request that has not answered by its model's p95 latency gets one
+    duplicate; whichever answers first wins and the other is cancelled,
+    which closes its HTTP connection. When a tier times out or fails
+    transiently (connection error, 429, 5xx) the next cheaper tier is tried,
+    and ModelUnavailableError is raised once none is left or the turn's
+    deadline has passed. Any other error (bad request, bad API key) is raised
+    as is, since no other tier would answer it either.
+
+    `client` is an openai.AsyncOpenAI; its requests run on one event loop
+    thread owned by this object, so callers stay synchronous and in-flight
+    requests hold no threads.
+    """
+
+    def __init__(self, client, tiers: List[ModelTier], tracker: LatencyTracker = None):
+        self.client = client
+        self.tiers = tiers
+        self.tracker = tracker if tracker is not None else LatencyTracker()
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="llm", daemon=True).start()
+
+    def tier(self, name: str) -> ModelTier:
+        for tier in self.tiers:
+            if tier.name == name:
+                return tier
+        raise ValueError(f"Tier desconocido: {name}")
+
+    def create(self, tier_name: str, deadline: float = None, fallback: bool = True, **kwargs):
+        """Completion from `tier_name` (or a cheaper tier) before `deadline`, a time.monotonic() value"""
+        future = asyncio.run_coroutine_threadsafe(self._create(tier_name, deadline, fallback, kwargs), self._loop)
+        return future.result()
+
+    async def _create(self, tier_name: str, deadline: Optional[float], fallback: bool, kwargs: dict):
+        position = self.tiers.index(self.tier(tier_name))
+        # The requested tier first, then each cheaper one
+        tiers = list(reversed(self.tiers[:position + 1])) if fallback else [self.tiers[position]]
+        last_error: Optional[Exception] = None
+        for tier in tiers:
+            if deadline is not None and deadline - time.monotonic() <= 0:
+                break
+            if last_error is not None:
+                self._count("fallbacks")
+            try:
+                return await self._hedged(tier, kwargs, deadline)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                last_error = e
+        raise ModelUnavailableError(str(last_error or "se agotó el tiempo del turno"))
+
+    async def _call(self, tier: ModelTier, kwargs: dict, timeout: float):
+        started = time.perf_counter()
+        response = await self.client.chat.completions.create(
+            model=tier.model,
+            max_tokens=tier.max_tokens,
+            timeout=timeout,
+            **kwargs
+        )
+        self.tracker.record(tier.model, time.perf_counter() - started)
+        return response
+
+    async def _hedged(self, tier: ModelTier, kwargs: dict, turn_deadline: Optional[float]):
+        self._count("requests")
+        deadline = time.monotonic() + tier.timeout_seconds
+        if turn_deadline is not None:
+            deadline = min(deadline, turn_deadline)
+        timeout = max(deadline - time.monotonic(), 0.01)
+        tasks = [asyncio.ensure_future(self._call(tier, kwargs, timeout))]
+
+        hedge_after = min(self.tracker.hedge_deadline(tier.model), timeout)
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            self._count("hedges")
+            remaining = max(deadline - time.monotonic(), 0.01)
+            tasks.append(asyncio.ensure_future(self._call(tier, kwargs, remaining)))
+
+        pending = set(tasks)
+        error: Optional[Exception] = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+                    # Waiting for the duplicate only helps with transient failures
+                    if not is_transient(error):
+                        raise error
+        finally:
+            # Cancelling the task aborts its HTTP request and frees the connection
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            # A duplicate that failed alongside the winner is not an error
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.exception()
+
+        if error is not None and not pending:
+            raise error
+        self._count("timeouts")
+        raise TimeoutError(f"{tier.model} no respondió en {tier.timeout_seconds}s")
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
@@ -0,0 +1,91 @@
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+# Spelling variants that mean the same thing, folded to one term on both the
+# catalog and the query side
+ALIASES = {
+    "aut": "automatico", "at": "automatico", "ta": "automatico",
+    "automatic": "automatico", "automatica": "automatico", "automatico": "automatico",
+    "mt": "manual", "std": "manual", "estandar": "manual", "standard": "manual",
+    "4wd": "4x4", "awd": "4x4", "4x4": "4x4",
+    "2wd": "4x2", "fwd": "4x2", "4x2": "4x2",
+    "hybrid": "hibrido", "hev": "hibrido",
+    "puertas": "ptas", "doors": "ptas", "drs": "ptas", "4drs": "4ptas",
+}
+
+# Catalog-only folds: in a version "AUTO" is the transmission, but in a
+# customer's "busco un auto" it just means car
+CATALOG_ALIASES = {**ALIASES, "auto": "automatico"}
+
+# Specific catalog terms that also belong to a broader family a customer asks
+# for ("diésel" should find TDI, "automático" should find CVT)
+FAMILIES = {
+    "cvt": "automatico", "dct": "automatico", "dsg": "automatico", "ivt": "automatico",
+    "tiptronic": "automatico", "xtronic": "automatico", "steptronic": "automatico",
+    "tdi": "diesel", "crdi": "diesel", "tdci": "diesel", "dci": "diesel", "hdi": "diesel",
+    "xdrive": "4x4", "4motion": "4x4", "quattro": "4x4", "4matic": "4x4",
+    "tsi": "turbo", "tfsi": "turbo",
+}
+
+STOPWORDS = {"de", "del", "el", "la", "los", "las", "con", "y", "un", "una", "en", "para", "the", "with", "and",
+             "auto", "autos"}
+
+
+def normalize(text: str, aliases: Dict[str, str] = ALIASES) -> List[str]:
+    """Lowercase, strip accents and fold aliases; numbers like 3.0 stay one token"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [aliases.get(token, token) for token in TOKEN_PATTERN.findall(text)]
+
+
+class CatalogSearchIndex:
+    """Token inverted index with BM25 scoring over distinct catalog texts.
+
+    `counts[i]` is how many catalog rows share document i, so collection
+    statistics (row count, document frequency, average length) are the same
+    as indexing every row, while identical rows are indexed once.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, documents: Iterable[str], counts: Iterable[int] = None):
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        lengths = []
+        for doc_id, document in enumerate(documents):
+            tokens = normalize(document, CATALOG_ALIASES)
+            tokens += [FAMILIES[token] for token in tokens if token in FAMILIES]
+            lengths.append(len(tokens))
+            for token in tokens:
+                postings[token][doc_id] = postings[token].get(doc_id, 0) + 1
+
+        self.doc_lengths = np.array(lengths, dtype=float)
+        self.counts = np.ones(len(lengths)) if counts is None else np.fromiter(counts, dtype=float)
+        self.size = float(self.counts.sum())
+        self.avg_length = float(self.doc_lengths @ self.counts / self.size) if self.size else 0.0
+        self.postings = {}
+        for token, docs in postings.items():
+            doc_ids = np.fromiter(docs.keys(), dtype=np.int64)
+            self.postings[token] = (doc_ids, np.fromiter(docs.values(), dtype=float), self.counts[doc_ids].sum())
+
+    @staticmethod
+    def terms(query: str) -> Tuple[str, ...]:
+        """Canonical query terms; queries with the same terms score identically"""
+        return tuple(sorted({token for token in normalize(query) if token not in STOPWORDS}))
+    
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document; zero means no query term matched"""
+        scores = np.zeros(len(self.doc_lengths))
+        for term in self.terms(query):
+            if term not in self.postings:
+                continue
+            doc_ids, tf, frequency = self.postings[term]
+            idf = np.log(1 + (self.size - frequency + 0.5) / (frequency + 0.5))
+            norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_ids] / self.avg_length)
+            scores[doc_ids] += idf * tf * (self.K1 + 1) / (tf + norm)
+        return scores
@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class InMemorySessionStore:
+    """Conversation histories kept in the current process (single worker)"""
+
+    def __init__(self):
+        self._conversations: Dict[str, List[Dict]] = {}
+        self._memories: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, phone_number: str) -> bool:
+        return phone_number in self._conversations
+
+    def get(self, phone_number: str) -> List[Dict]:
+        with self._lock:
+            return list(self._conversations.get(phone_number, []))
+
+    def append(self, phone_number: str, message: Dict, max_messages: Optional[int] = None):
+        with self._lock:
+            history = self._conversations.setdefault(phone_number, [])
+            history.append(message)
+            if max_messages and len(history) > max_messages:
+                self._conversations[phone_number] = history[-max_messages:]
+
+    def get_memory(self, phone_number: str) -> Dict:
+        with self._lock:
+            return json.loads(json.dumps(self._memories.get(phone_number, {})))
+
+    def set_memory(self, phone_number: str, memory: Dict):
+        with self._lock:
+            self._memories[phone_number] = json.loads(json.dumps(memory))
+
+    def delete(self, phone_number: str):
+        with self._lock:
+            self._conversations.pop(phone_number, None)
+            self._memories.pop(phone_number, None)
+
+
+class SQLiteSessionStore:
+    """Conversation histories shared by every worker through a SQLite file in WAL mode"""
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "phone_number TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memories ("
+                "phone_number TEXT PRIMARY KEY, memory TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __contains__(self, phone_number: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM conversations WHERE phone_number = ?", (phone_number,)
+        ).fetchone()
+        return row is not None
+
+    def get(self, phone_number: str) -> List[Dict]:
+        row = self._connection().execute(
+            "SELECT messages FROM conversations WHERE phone_number = ?", (phone_number,)
+        ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def append(self, phone_number: str, message: Dict, max_messages: Optional[int] = None):
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent workers
+        # cannot interleave their read-modify-write of the same history
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT messages FROM conversations WHERE phone_number = ?", (phone_number,)
+            ).fetchone()
+            history = json.loads(row[0]) if row else []
+            history.append(message)
+            if max_messages and len(history) > max_messages:
+                history = history[-max_messages:]
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (phone_number, messages, updated_at) VALUES (?, ?, ?)",
+                (phone_number, json.dumps(history, ensure_ascii=False), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_memory(self, phone_number: str) -> Dict:
+        row = self._connection().execute(
+            "SELECT memory FROM memories WHERE phone_number = ?", (phone_number,)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set_memory(self, phone_number: str, memory: Dict):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO memories (phone_number, memory, updated_at) VALUES (?, ?, ?)",
+            (phone_number, json.dumps(memory, ensure_ascii=False), time.time())
+        )
+
+    def delete(self, phone_number: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM conversations WHERE phone_number = ?", (phone_number,))
+        conn.execute("DELETE FROM memories WHERE phone_number = ?", (phone_number,))
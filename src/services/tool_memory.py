@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional
+from ..models.car import Car, FinancingPlan
+
+
+class ToolMemory:
+    """Compact record of a session's recent tool results, stored as a plain dict.
+
+    The dict is updated in place so the caller can persist it as JSON. Cars are
+    numbered in the order they were shown, which is how the customer refers to
+    them ("el segundo"); `focus` is the car the conversation is currently about.
+    """
+
+    MAX_CARS = 10
+
+    def __init__(self, data: Optional[Dict] = None):
+        self.data = data if data is not None else {}
+
+    @property
+    def cars(self) -> List[Dict]:
+        return self.data.get("cars", [])
+
+    def remember_cars(self, cars: List[Car], plans: Optional[List[FinancingPlan]] = None):
+        # A search with no results keeps the previous ones referable
+        if not cars:
+            return
+        entries = []
+        for i, car in enumerate(cars[:self.MAX_CARS]):
+            entry = {
+                "stock_id": car.stock_id,
+                "label": f"{car.year} {car.make} {car.model}",
+                "price": car.price,
+            }
+            if plans:
+                entry["plan"] = _plan_summary(plans[i])
+            entries.append(entry)
+        self.data["cars"] = entries
+        self.data["focus"] = 1 if len(entries) == 1 else None
+
+    def remember_plan(self, plan: FinancingPlan, ordinal: Optional[int] = None):
+        self.data["plan"] = {"ordinal": ordinal, "car_price": plan.car_price, **_plan_summary(plan)}
+        if ordinal is not None:
+            self.data["focus"] = ordinal
+
+    def car(self, ordinal: int) -> Optional[Dict]:
+        if 1 <= ordinal <= len(self.cars):
+            return self.cars[ordinal - 1]
+        return None
+
+    def ordinal_of(self, stock_id: str) -> Optional[int]:
+        for ordinal, entry in enumerate(self.cars, 1):
+            if entry["stock_id"] == stock_id:
+                return ordinal
+        return None
+
+    def focus(self, ordinal: int):
+        self.data["focus"] = ordinal
+
+    def prompt(self) -> Optional[str]:
+        """System message listing the remembered results, or None when empty"""
+        if not self.cars and "plan" not in self.data:
+            return None
+        lines = ["AUTOS MOSTRADOS (usa `ordinal` en las herramientas para referirte a ellos sin volver a buscar):"]
+        for ordinal, entry in enumerate(self.cars, 1):
+            line = f"{ordinal}. {entry['label']} - ${entry['price']:,.2f} - ID {entry['stock_id']}"
+            if "plan" in entry:
+                plan = entry["plan"]
+                line += f" - ${plan['monthly_payment']:,.2f}/mes a {plan['years']} años"
+            lines.append(line)
+        if self.data.get("focus"):
+            lines.append(f"Auto en conversación: {self.data['focus']}")
+        plan = self.data.get("plan")
+        if plan:
+            car = f"auto {plan['ordinal']}" if plan["ordinal"] else f"${plan['car_price']:,.2f}"
+            lines.append(
+                f"Último plan: {car}, enganche ${plan['down_payment']:,.2f}, "
+                f"{plan['years']} años, ${plan['monthly_payment']:,.2f}/mes"
+            )
+        return "\n".join(lines)
+
+
+def _plan_summary(plan: FinancingPlan) -> Dict:
+    return {"down_payment": plan.down_payment, "monthly_payment": plan.monthly_payment, "years": plan.years}
@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+
+class TurnFailedError(Exception):
+    """The turn a retry was waiting for failed; Twilio's next retry runs it again"""
+
+
+class TurnDeduplicator:
+    """Bounded TTL cache of webhook turns keyed by Twilio's MessageSid.
+
+    The first request for a key owns the turn (`claim` returns True) and
+    resolves it with `complete` or `fail`; retries of the same key `poll` for
+    that outcome instead of running the turn again. No method blocks, so
+    callers can wait on the event loop. Only sees the current
+    process; use SQLiteTurnDeduplicator when several workers serve the webhook.
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.duplicates = 0
+        # key -> [done, reply, created]
+        self._entries: "OrderedDict[str, List]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> bool:
+        """Whether the caller must run the turn (False for retries)"""
+        with self._lock:
+            now = self.clock()
+            self._purge(now)
+            if key in self._entries:
+                self.duplicates += 1
+                return False
+
+            self._entries[key] = [False, None, now]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def poll(self, key: str) -> Tuple[bool, Optional[str]]:
+        """(done, reply) of the owner's turn; raises TurnFailedError if it failed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise TurnFailedError(key)
+            return entry[0], entry[1]
+
+    def complete(self, key: str, reply: Optional[str]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[0], entry[1] = True, reply
+
+    def fail(self, key: str):
+        """Drop a key so the next retry runs the turn again"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _purge(self, now: float):
+        # Entries are kept in insertion order, so expired ones are at the front
+        while self._entries:
+            key, (_, _, created) = next(iter(self._entries.items()))
+            if now - created < self.ttl_seconds:
+                break
+            del self._entries[key]
+
+
+class SQLiteTurnDeduplicator:
+    """TurnDeduplicator shared by every worker through the session database.
+
+    A claim is an INSERT OR IGNORE of a pending row, so exactly one worker owns
+    each MessageSid; retries on any worker poll the row until the owner marks
+    it done with the reply, or deletes it after a failure.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 600, max_entries: int = 10000,
+                 timeout: float = 5.0,
+                 clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.clock = clock
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "message_sid TEXT PRIMARY KEY, done INTEGER NOT NULL, reply TEXT, created_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str) -> bool:
+        conn = self._connection()
+        now = self.clock()
+        conn.execute("DELETE FROM turns WHERE created_at <= ?", (now - self.ttl_seconds,))
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO turns (message_sid, done, reply, created_at) VALUES (?, 0, NULL, ?)",
+            (key, now)
+        ).rowcount
+        if not inserted:
+            with self._lock:
+                self.duplicates += 1
+            return False
+        conn.execute(
+            "DELETE FROM turns WHERE message_sid IN "
+            "(SELECT message_sid FROM turns ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        return True
+
+    def poll(self, key: str) -> Tuple[bool, Optional[str]]:
+        row = self._connection().execute(
+            "SELECT done, reply FROM turns WHERE message_sid = ?", (key,)
+        ).fetchone()
+        if row is None:
+            raise TurnFailedError(key)
+        return bool(row[0]), row[1]
+
+    def complete(self, key: str, reply: Optional[str]):
+        self._connection().execute(
+            "UPDATE turns SET done = 1, reply = ? WHERE message_sid = ?", (reply, key)
+        )
+
+    def fail(self, key: str):
+        self._connection().execute("DELETE FROM turns WHERE message_sid = ?", (key,))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM turns").fetchone()[0]
@@ -1,14 +1,35 @@
 from twilio.rest import Client
 from twilio.twiml.messaging_response import MessagingResponse
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional
+import asyncio
 import json
+import time
+from .session_store import InMemorySessionStore
+from .turn_cache import TurnDeduplicator
+from .message_coalescer import MessageCoalescer
 
 
 class WhatsAppService:
-    def __init__(self, account_sid: str, auth_token: str, phone_number: str):
+    MAX_HISTORY = 10
+    # Twilio gives up on a webhook after 15 seconds, so a retry should not wait longer
+    RETRY_WAIT_SECONDS = 15
+    RETRY_POLL_SECONDS = 0.05
+    
+    def __init__(self, account_sid: str, auth_token: str, phone_number: str, session_store=None,
+                 deduplicator: TurnDeduplicator = None, coalescer: MessageCoalescer = None,
+                 max_workers: int = 16):
         self.client = Client(account_sid, auth_token)
         self.phone_number = phone_number
-        self.conversations: Dict[str, List[Dict]] = {}
+        # Any store with get/append/get_memory/set_memory/delete works; use SQLiteSessionStore to share across workers
+        self.conversations = session_store if session_store is not None else InMemorySessionStore()
+        self.deduplicator = deduplicator if deduplicator is not None else TurnDeduplicator()
+        # Optional: merges messages sent in quick succession into one turn
+        self.coalescer = coalescer
+        # Model calls and store I/O run here, not in the server's threadpool,
+        # so a WhatsApp burst cannot starve the other endpoints
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="whatsapp")
     
     def send_message(self, to_number: str, message: str):
         """Send a WhatsApp message"""
@@ -25,32 +46,85 @@ class WhatsAppService:
     
     def handle_incoming_message(self, from_number: str, message_body: str) -> str:
         """Handle incoming WhatsApp message and return response"""
-        # Initialize conversation history if not exists
-        if from_number not in self.conversations:
-            self.conversations[from_number] = []
-        
-        # Add user message to conversation history
-        self.conversations[from_number].append({
+        # Add user message to conversation history, keeping only the last
+        # messages to avoid token limits
+        self.conversations.append(from_number, {
             "role": "user",
             "content": message_body
-        })
-        
-        # Keep only last 10 messages to avoid token limits
-        if len(self.conversations[from_number]) > 10:
-            self.conversations[from_number] = self.conversations[from_number][-10:]
+        }, max_messages=self.MAX_HISTORY)
         
         return f"whatsapp:{from_number}"
     
+    async def respond(self, from_number: str, message_body: str, message_sid: Optional[str],
+                      generate_reply: Callable[[str, List[Dict], Dict], str]) -> Optional[str]:
+        """Run one conversation turn, at most once per Twilio MessageSid.
+        
+        Twilio retries a slow webhook with the same MessageSid. A retry gets the
+        reply of the original turn (waiting for it if still running) and never
+        touches the history or the model again; with SQLiteTurnDeduplicator this
+        holds across workers. Returns None when the original
+        turn is still running after RETRY_WAIT_SECONDS, or when the message was
+        folded into a later message's turn by the coalescer.
+        
+        `generate_reply(message, history, memory)` may update `memory`, the
+        session's structured tool results, which is saved after the turn. It
+        runs on this service's executor; every wait happens on the event loop.
+        """
+        if not message_sid:
+            return await self._run_turn(from_number, message_body, generate_reply)
+        
+        if not await self._blocking(self.deduplicator.claim, message_sid):
+            return await self._wait_for_turn(message_sid)
+        
+        try:
+            reply = await self._run_turn(from_number, message_body, generate_reply)
+        except Exception:
+            # Let Twilio's next retry try again instead of caching the failure
+            await self._blocking(self.deduplicator.fail, message_sid)
+            raise
+        await self._blocking(self.deduplicator.complete, message_sid, reply)
+        return reply
+    
+    async def _blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args))
+    
+    async def _wait_for_turn(self, message_sid: str) -> Optional[str]:
+        deadline = time.monotonic() + self.RETRY_WAIT_SECONDS
+        while True:
+            done, reply = await self._blocking(self.deduplicator.poll, message_sid)
+            if done:
+                return reply
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.RETRY_POLL_SECONDS)
+    
+    async def _run_turn(self, from_number: str, message_body: str,
+                        generate_reply: Callable[[str, List[Dict], Dict], str]) -> Optional[str]:
+        if self.coalescer is not None:
+            message_body = await self.coalescer.submit(from_number, message_body)
+            if message_body is None:
+                return None
+        return await self._blocking(self._generate, from_number, message_body, generate_reply)
+    
+    def _generate(self, from_number: str, message_body: str,
+                  generate_reply: Callable[[str, List[Dict], Dict], str]) -> str:
+        # The user message is stored only with its reply, so a failed turn
+        # leaves no orphan behind for the retry to duplicate
+        history = self.get_conversation_history(from_number)[-(self.MAX_HISTORY - 1):]
+        memory = self.conversations.get_memory(from_number)
+        reply = generate_reply(message_body, history, memory)
+        self.handle_incoming_message(from_number, message_body)
+        self.add_assistant_message(from_number, reply)
+        self.conversations.set_memory(from_number, memory)
+        return reply
+    
     def get_conversation_history(self, phone_number: str) -> List[Dict]:
         """Get conversation history for a phone number"""
-        return self.conversations.get(phone_number, [])
+        return self.conversations.get(phone_number)
     
     def add_assistant_message(self, phone_number: str, message: str):
         """Add assistant message to conversation history"""
-        if phone_number not in self.conversations:
-            self.conversations[phone_number] = []
-        
-        self.conversations[phone_number].append({
+        self.conversations.append(phone_number, {
             "role": "assistant",
             "content": message
         })
@@ -61,7 +135,10 @@ class WhatsAppService:
         resp.message(message)
         return str(resp)
     
+    def create_empty_response(self) -> str:
+        """TwiML that acknowledges the webhook without sending a message"""
+        return str(MessagingResponse())
+    
     def clear_conversation(self, phone_number: str):
-        """Clear conversation history for a phone number"""
-        if phone_number in self.conversations:
-            del self.conversations[phone_number]
\ No newline at end of file
+        """Clear conversation history and tool memory for a phone number"""
+        self.conversations.delete(phone_number)
\ No newline at end of file
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_caso_ai_engineer.csv')
+os.environ.setdefault("CATALOG_CSV_PATH", CSV_PATH)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "AC_test")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "test")
+os.environ.setdefault("WHATSAPP_COALESCE_SECONDS", "0")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import main
+from src.models.car import AffordabilityQuery, Car, CarFilter
+from src.services.lazy import LazyService
+from benchmarks.profile_startup import profile_startup
+
+# Cold-start budget for `import main`; fastapi itself is most of it
+IMPORT_BUDGET_SECONDS = 3.0
+
+client = TestClient(main.app)
+
+
+def _legacy_body(content) -> bytes:
+    """How FastAPI rendered the endpoint's return value before fragments"""
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+# The original CarService queries, in plain pandas over the raw CSV, so the
+# endpoints are checked against the old logic rather than against themselves
+def _legacy_search(filters: CarFilter, limit: int) -> list:
+    import pandas as pd
+    from fuzzywuzzy import fuzz, process
+
+    df = pd.read_csv(CSV_PATH)
+    if filters.make:
+        best_match = process.extractOne(filters.make, df['make'].unique(), scorer=fuzz.ratio)
+        if best_match and best_match[1] >= 70:
+            df = df[df['make'] == best_match[0]]
+    if filters.min_price:
+        df = df[df['price'] >= filters.min_price]
+    if filters.max_price:
+        df = df[df['price'] <= filters.max_price]
+    if filters.max_km:
+        df = df[df['km'] <= filters.max_km]
+    if filters.min_year:
+        df = df[df['year'] >= filters.min_year]
+    df = df.sort_values('price')
+    return [Car(**row.to_dict()) for _, row in df.head(limit).iterrows()]
+
+
+def _legacy_stats() -> dict:
+    import pandas as pd
+
+    df = pd.read_csv(CSV_PATH)
+    return {
+        "total_cars": len(df),
+        "price_range": {
+            'min': float(df['price'].min()),
+            'max': float(df['price'].max()),
+            'avg': float(df['price'].mean())
+        },
+        "popular_makes": df['make'].value_counts().head(10).index.tolist()
+    }
+
+
+def test_cars_response_is_byte_compatible():
+    """/cars arma los mismos bytes que la serialización de Pydantic"""
+    print("🧾 Probando compatibilidad de /cars...")
+
+    cases = [
+        ({}, CarFilter(), 10),
+        ({"make": "toyot", "limit": 3}, CarFilter(make="toyot"), 3),
+        ({"max_price": 300000, "min_year": 2018, "limit": 1000}, CarFilter(max_price=300000, min_year=2018), 1000),
+        ({"make": "marca inexistente xyz", "max_km": 1}, CarFilter(make="marca inexistente xyz", max_km=1), 10),
+    ]
+    for params, filters, limit in cases:
+        response = client.get("/cars", params=params)
+        cars = _legacy_search(filters, limit)
+        assert response.headers["content-type"] == "application/json"
+        assert response.content == _legacy_body({"cars": cars, "count": len(cars)}), params
+    print(f"  ✅ {len(cases)} combinaciones de filtros idénticas byte a byte")
+
+
+def test_cars_by_monthly_payment():
+    """/cars?monthly_payment=... devuelve cada auto junto a su plan"""
+    print("\n💳 Probando búsqueda por pago mensual...")
+
+    params = {"monthly_payment": 8000, "down_payment_pct": 20, "limit": 5}
+    response = client.get("/cars", params=params)
+    body = response.json()
+    expected = main.get_car_service().search_affordable_cars(
+        CarFilter(), AffordabilityQuery(monthly_payment=8000, down_payment_pct=20), main.get_financing_service(), 5
+    )
+    assert body["count"] == len(body["results"]) == len(expected) > 0
+    assert body["results"] == jsonable_encoder(expected)
+    for item in body["results"]:
+        assert set(item) == {"car", "financing_plan"}
+        assert item["financing_plan"]["car_price"] == item["car"]["price"]
+        assert item["financing_plan"]["monthly_payment"] <= 8000.01
+
+    assert "error" in client.get("/cars", params={"monthly_payment": 8000, "max_years": 8}).json()
+    print(f"  ✅ {body['count']} autos con su plan")
+
+
+def test_car_detail_and_stats_are_byte_compatible():
+    """/cars/{stock_id} y /stats conservan su esquema"""
+    print("\n🧾 Probando compatibilidad de /cars/{stock_id} y /stats...")
+
+    import pandas as pd
+
+    car = Car(**pd.read_csv(CSV_PATH).iloc[0].to_dict())
+    response = client.get(f"/cars/{car.stock_id}")
+    assert response.content == _legacy_body({"car": car})
+
+    response = client.get("/cars/no-existe")
+    assert response.json() == {"error": "Car not found"}
+
+    response = client.get("/stats")
+    assert response.content == _legacy_body(_legacy_stats())
+    print("  ✅ Detalle y estadísticas idénticos byte a byte")
+
+
+def test_fragments_follow_catalog_reload():
+    """Los fragmentos se reconstruyen al recargar el catálogo"""
+    print("\n🔄 Probando recarga del catálogo...")
+
+    car_service = main.get_car_service()
+    version = car_service.catalog_version
+    car = car_service.get_all_cars()[0]
+    before = car_service.get_car_json(car.stock_id)
+
+    car_service.reload()
+
+    assert car_service.catalog_version == version + 1
+    assert car_service.get_car_json(car.stock_id) == before
+    assert car_service.get_car_json(car.stock_id) == _legacy_body(car)
+    print(f"  ✅ Versión del catálogo {version} → {car_service.catalog_version}")
+
+
+def test_webhook_retries_reuse_reply():
+    """Los reintentos del webhook devuelven el mismo TwiML sin llamar al modelo"""
+    print("\n📲 Probando reintentos del webhook de WhatsApp...")
+
+    calls = []
+
+    class FakeLLM:
+        def process_message(self, message, history=None, memory=None):
+            calls.append(message)
+            return f"Hola, tengo {len(history)} mensajes previos"
+
+    main.app.dependency_overrides[main.get_llm_service] = FakeLLM
+    try:
+        form = {"Body": "hola", "From": "whatsapp:+5215500000000", "To": "whatsapp:+1", "MessageSid": "SMretry"}
+        bodies = [client.post("/webhook/whatsapp", data=form).content for _ in range(3)]
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert len(calls) == 1
+    assert len(set(bodies)) == 1 and b"Hola, tengo 0 mensajes previos" in bodies[0]
+    history = main.get_whatsapp_service().get_conversation_history("whatsapp:+5215500000000")
+    assert len(history) == 2
+    print("  ✅ 3 entregas, 1 turno del modelo")
+
+
+def test_whatsapp_stats_hide_phone_numbers():
+    """/whatsapp/stats publica solo totales, sin números de teléfono"""
+    print("\n🙈 Probando estadísticas públicas de WhatsApp...")
+
+    import asyncio
+    from types import SimpleNamespace
+    from src.services.message_coalescer import MessageCoalescer
+
+    coalescer = MessageCoalescer(window_seconds=0)
+
+    async def send():
+        for phone in ["whatsapp:+5215511111111", "whatsapp:+5215522222222"]:
+            await coalescer.submit(phone, "hola")
+
+    asyncio.run(send())
+    main.app.dependency_overrides[main.get_whatsapp_service] = lambda: SimpleNamespace(coalescer=coalescer)
+    try:
+        response = client.get("/whatsapp/stats")
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.json() == {"active_sessions": 2, "messages": 2, "turns": 2, "llm_calls_saved": 0}
+    assert "whatsapp:" not in response.text and "55111" not in response.text
+    print("  ✅ solo totales")
+
+
+def test_uvicorn_workers_share_state():
+    """`uvicorn main:app --workers 2` comparte snapshot y sesiones sin pasar por `python main.py`"""
+    print("\n👯 Probando workers lanzados directamente con uvicorn...")
+
+    import socket
+    import subprocess
+    import tempfile
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    runtime_dir = tempfile.mkdtemp(prefix="kavak-workers-")
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("WEB_CONCURRENCY", "CATALOG_SNAPSHOT_DIR", "SESSION_DB_PATH")}
+    env.update(CATALOG_CSV_PATH=os.path.abspath(CSV_PATH), KAVAK_RUNTIME_DIR=runtime_dir)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--workers", "2", "--port", str(port)],
+        cwd=os.path.join(os.path.dirname(__file__), '..'), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 60
+        ready = 0
+        while ready < 10:
+            assert time.monotonic() < deadline and server.poll() is None
+            try:
+                ready += httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    assert os.path.exists(os.path.join(runtime_dir, "catalog", "meta.json"))
+    assert os.path.exists(os.path.join(runtime_dir, "sessions.db"))
+    print("  ✅ snapshot y sesiones en el directorio compartido")
+
+
+def test_cold_start_budget():
+    """Importar main no carga pandas, openai ni twilio y cabe en el presupuesto"""
+    print("\n🧊 Probando arranque en frío...")
+
+    report = profile_startup()
+    assert report["heavy_modules_after_import"] == []
+    assert report["import_main_seconds"] < IMPORT_BUDGET_SECONDS
+    for name, status in report["services"].items():
+        assert status["ready"], f"{name}: {status['error']}"
+    print(f"  ✅ import main en {report['import_main_seconds']:.2f}s")
+
+
+def test_export_streams_every_match():
+    """/cars/export devuelve todos los autos filtrados en NDJSON o CSV, con gzip opcional"""
+    print("\n📤 Probando exportación del catálogo...")
+
+    import pandas as pd
+
+    car_service = main.get_car_service()
+    cases = [
+        ({}, CarFilter()),
+        ({"make": "vw", "max_price": 500000}, CarFilter(make="vw", max_price=500000)),
+        ({"q": "automatico", "min_year": 2018}, CarFilter(q="automatico", min_year=2018)),
+    ]
+    for params, filters in cases:
+        expected = car_service.search_cars(filters, len(car_service.get_all_cars()))
+        expected_ids = sorted(car.stock_id for car in expected)
+
+        response = client.get("/cars/export", params=params, headers={"Accept-Encoding": "identity"})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+        lines = response.content.decode("utf-8").splitlines()
+        by_id = {car.stock_id: car for car in expected}
+        for line in lines:
+            car = json.loads(line)
+            assert car == by_id[car["stock_id"]].model_dump(mode="json")
+        assert sorted(json.loads(line)["stock_id"] for line in lines) == expected_ids, params
+
+        response = client.get("/cars/export", params={**params, "format": "csv"}, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/csv")
+        exported = pd.read_csv(io.BytesIO(response.content), dtype={"stock_id": str})
+        assert list(exported.columns) == list(car_service.df.columns)
+        assert sorted(exported["stock_id"]) == expected_ids, params
+
+    # q=0 refuses an encoding; "*" covers gzip unless gzip itself is listed
+    for accept, gzipped in [("gzip;q=0, identity", False), ("br, gzip; q=0.5", True),
+                            ("*", True), ("gzip;q=0, *", False), ("deflate", False)]:
+        response = client.get("/cars/export", params={"format": "csv"}, headers={"Accept-Encoding": accept})
+        assert ("content-encoding" in response.headers) == gzipped, accept
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.text.startswith("stock_id"), accept
+
+    # The same stream, compressed
+    raw = b"".join(main.catalog_export.iter_export(car_service, CarFilter(), "csv", chunk_size=7))
+    assert gzip.decompress(b"".join(main.catalog_export.gzip_chunks([raw[:100], raw[100:]]))) == raw
+
+    empty = client.get("/cars/export", params={"make": "marca inexistente xyz", "max_km": 1, "format": "csv"})
+    assert empty.text.strip() == ",".join(car_service.df.columns)
+    assert "error" in client.get("/cars/export", params={"format": "xml"}).json()
+    print(f"  ✅ {len(cases)} combinaciones de filtros exportadas")
+
+
+def test_liveness_and_readiness():
+    """/health responde sin servicios; /ready espera a que estén inicializados"""
+    print("\n🚦 Probando liveness y readiness...")
+
+    assert client.get("/health").status_code == 200
+    main.warm_up()
+    response = client.get("/ready")
+    assert response.status_code == 200 and response.json()["status"] == "ready"
+    print("  ✅ /health y /ready responden")
+
+
+def test_ready_builds_lazy_services():
+    """Sin warm-up al arrancar, el sondeo de /ready inicia la construcción y llega a 200"""
+    print("\n🥶 Probando /ready en modo diferido...")
+
+    original = dict(main.services)
+    try:
+        for name, service in original.items():
+            main.services[name] = LazyService(name, service.factory)
+        assert client.get("/ready").status_code == 503
+        deadline = time.monotonic() + 10
+        while client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline, client.get("/ready").json()
+            time.sleep(0.05)
+    finally:
+        main.services.update(original)
+    print("  ✅ /ready pasa a 200 sin tráfico previo")
+
+
+def run_all_tests():
+    """Ejecuta todas las pruebas de la API"""
+    print("🧪 Iniciando pruebas de la API\n")
+
+    tests = [
+        ("Compatibilidad /cars", test_cars_response_is_byte_compatible),
+        ("Pago mensual", test_cars_by_monthly_payment),
+        ("Compatibilidad detalle y stats", test_car_detail_and_stats_are_byte_compatible),
+        ("Recarga del catálogo", test_fragments_follow_catalog_reload),
+        ("Reintentos del webhook", test_webhook_retries_reuse_reply),
+        ("Exportación", test_export_streams_every_match),
+        ("Estadísticas de WhatsApp", test_whatsapp_stats_hide_phone_numbers),
+        ("Workers de uvicorn", test_uvicorn_workers_share_state),
+        ("Arranque en frío", test_cold_start_budget),
+        ("Liveness y readiness", test_liveness_and_readiness),
+        ("Readiness diferido", test_ready_builds_lazy_services),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+            print(f"\n✅ PASS - {test_name}")
+        except Exception as e:
+            print(f"\n❌ FAIL - {test_name}: {e}")
+
+    print(f"\nResultado: {passed}/{len(tests)} pruebas exitosas")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
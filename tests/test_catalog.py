@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.car_service import CarService
+from src.services.financing_service import FinancingService
+from src.services.catalog_snapshot import build_snapshot
+from src.services.catalog_rows import CatalogRows
+from src.services import json_encoding
+from src.models.car import Car, CarFilter, FinancingRequest, AffordabilityQuery
+from benchmarks.catalog_generator import generate_catalog, write_catalog
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_caso_ai_engineer.csv')
+
+
+def test_affordable_search_respects_budget():
+    """Cada auto devuelto tiene un plan dentro del pago mensual"""
+    print("💳 Probando búsqueda por pago mensual...")
+
+    car_service = CarService(CSV_PATH)
+    financing_service = FinancingService()
+    query = AffordabilityQuery(monthly_payment=8000, down_payment_pct=20)
+    results = car_service.search_affordable_cars(CarFilter(), query, financing_service, limit=100)
+
+    assert results, "Se esperaban autos dentro del presupuesto"
+    for item in results:
+        assert item.financing_plan.monthly_payment <= 8000.01
+        assert item.financing_plan.car_price == item.car.price
+    prices = [item.car.price for item in results]
+    assert prices == sorted(prices)
+    print(f"  ✅ {len(results)} autos con mensualidad ≤ $8,000")
+
+
+def test_affordable_search_picks_cheapest_plan():
+    """El plan adjunto coincide con calculate_financing y es el plazo más corto que califica"""
+    print("\n📉 Probando plan más barato por auto...")
+
+    car_service = CarService(CSV_PATH)
+    financing_service = FinancingService()
+    query = AffordabilityQuery(monthly_payment=10000, down_payment=60000)
+    results = car_service.search_affordable_cars(CarFilter(), query, financing_service, limit=100)
+
+    assert results
+    for item in results:
+        plan = item.financing_plan
+        expected = financing_service.calculate_financing(FinancingRequest(
+            car_price=item.car.price, down_payment=60000, years=plan.years
+        ))
+        assert plan == expected
+        for years in range(financing_service.MIN_YEARS, plan.years):
+            shorter = financing_service.calculate_financing(FinancingRequest(
+                car_price=item.car.price, down_payment=60000, years=years
+            ))
+            assert shorter.monthly_payment > 10000
+    print(f"  ✅ {len(results)} planes coinciden con calculate_financing")
+
+
+def test_affordable_search_is_complete():
+    """Ningún auto que califique queda fuera y se combinan los filtros existentes"""
+    print("\n🔍 Probando cobertura de la búsqueda por pago mensual...")
+
+    car_service = CarService(CSV_PATH)
+    financing_service = FinancingService()
+    query = AffordabilityQuery(monthly_payment=7000, down_payment_pct=30, min_years=4, max_years=5)
+    filters = CarFilter(min_year=2017)
+    results = car_service.search_affordable_cars(filters, query, financing_service, limit=1000)
+
+    expected = set()
+    for car in car_service.get_all_cars():
+        if car.year < 2017:
+            continue
+        for years in (4, 5):
+            plan = financing_service.calculate_financing(FinancingRequest(
+                car_price=car.price, down_payment=car.price * 0.30, years=years
+            ))
+            if plan.monthly_payment <= 7000:
+                expected.add(car.stock_id)
+                break
+
+    assert {item.car.stock_id for item in results} == expected
+    print(f"  ✅ {len(expected)} autos esperados, {len(results)} encontrados")
+
+
+def test_affordable_search_validates_query():
+    """Plazos fuera de rango se rechazan como en calculate_financing"""
+    print("\n⚠️  Probando validación de la búsqueda por pago mensual...")
+
+    car_service = CarService(CSV_PATH)
+    try:
+        car_service.search_affordable_cars(
+            CarFilter(), AffordabilityQuery(monthly_payment=8000, max_years=8), FinancingService()
+        )
+    except ValueError as e:
+        print(f"  ✅ {e}")
+    else:
+        raise AssertionError("Se esperaba ValueError para un plazo de 8 años")
+
+
+def test_snapshot_matches_csv():
+    """El snapshot memory-mapped produce el mismo catálogo que el CSV"""
+    print("\n🗂️  Probando snapshot compartido del catálogo...")
+
+    snapshot_dir = build_snapshot(CSV_PATH, os.path.join(tempfile.mkdtemp(), "catalog"))
+    from_csv = CarService(CSV_PATH)
+    from_snapshot = CarService.from_snapshot(snapshot_dir)
+
+    assert list(from_snapshot.get_all_cars()) == list(from_csv.get_all_cars())
+    filters = CarFilter(make="nisan", max_price=400000)
+    assert from_snapshot.search_cars(filters, 20) == from_csv.search_cars(filters, 20)
+    assert from_snapshot.get_popular_makes() == from_csv.get_popular_makes()
+
+    for car in from_csv.get_all_cars():
+        assert from_snapshot.get_car_json(car.stock_id) == from_csv.get_car_json(car.stock_id)
+    assert from_snapshot.get_car_by_id("0" + car.stock_id) is None
+    assert from_snapshot.get_car_by_id("no-existe") is None
+
+    # Numeric columns and text codes are read straight from the shared mapping, not copied
+    def mapped(array):
+        while array is not None and not isinstance(array, np.memmap):
+            array = array.base
+        return array is not None
+
+    assert mapped(from_snapshot.df['price'].to_numpy())
+    assert mapped(from_snapshot.df['version'].cat.codes.to_numpy())
+    print(f"  ✅ {len(from_snapshot.get_all_cars())} autos idénticos desde el snapshot")
+
+
+def test_ensure_snapshot_builds_once():
+    """Varios workers que arrancan a la vez construyen el snapshot una sola vez"""
+    print("\n🔒 Probando construcción única del snapshot...")
+
+    import threading
+    from src.services import catalog_snapshot
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.csv")
+    write_catalog(path, 300, seed=6)
+    snapshot_dir = os.path.join(tempfile.mkdtemp(), "runtime", "catalog")
+    builds = []
+    build = catalog_snapshot.build_snapshot
+    catalog_snapshot.build_snapshot = lambda *args: builds.append(args) or build(*args)
+    try:
+        threads = [threading.Thread(target=catalog_snapshot.ensure_snapshot, args=(path, snapshot_dir))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(builds) == 1
+        assert len(CarService.from_snapshot(snapshot_dir).get_all_cars()) == 300
+
+        # A newer CSV is rebuilt; a missing one keeps the snapshot
+        write_catalog(path, 200, seed=7)
+        os.utime(path, (os.path.getmtime(path) + 5,) * 2)
+        catalog_snapshot.ensure_snapshot(path, snapshot_dir)
+        os.remove(path)
+        catalog_snapshot.ensure_snapshot(path, snapshot_dir)
+        assert len(builds) == 2
+        assert len(CarService.from_snapshot(snapshot_dir).get_all_cars()) == 200
+    finally:
+        catalog_snapshot.build_snapshot = build
+    print("  ✅ 4 arranques simultáneos, 1 construcción")
+
+
+def test_popular_makes_keep_csv_order():
+    """Las marcas populares empatan igual que value_counts sobre el CSV original"""
+    print("\n🏷️  Probando orden de marcas populares...")
+
+    car_service = CarService(CSV_PATH)
+    assert car_service.get_popular_makes() == [
+        'Nissan', 'Chevrolet', 'KIA', 'Mazda', 'Volkswagen', 'Honda', 'BMW', 'Mercedes Benz', 'Ford', 'Renault'
+    ]
+
+    # Many ties on a synthetic catalog, from the CSV and from a snapshot
+    path = os.path.join(tempfile.mkdtemp(), "catalog.csv")
+    write_catalog(path, 2000, seed=5)
+    expected = pd.read_csv(path)['make'].value_counts().head(10).index.tolist()
+    assert CarService(path).get_popular_makes() == expected
+    snapshot_dir = build_snapshot(path, os.path.join(tempfile.mkdtemp(), "catalog"))
+    assert CarService.from_snapshot(snapshot_dir).get_popular_makes() == expected
+    print(f"  ✅ {expected[:3]}...")
+
+
+def test_text_search_synonyms():
+    """Sinónimos en español e inglés encuentran la misma versión"""
+    print("\n🔤 Probando búsqueda de texto con sinónimos...")
+
+    car_service = CarService(CSV_PATH)
+    cases = {
+        "4x4": "4WD",
+        "diésel": "TDI",
+        "automático": None,
+        "HSE": "HSE",
+    }
+    for query, expected_token in cases.items():
+        results = car_service.search_cars(CarFilter(q=query), limit=100)
+        assert results, query
+        if expected_token:
+            assert any(expected_token in car.version for car in results), query
+        print(f"  ✅ '{query}' → {len(results)} autos")
+
+    automatic = {car.stock_id for car in car_service.search_cars(CarFilter(q="automatic"), limit=100)}
+    for car in car_service.get_all_cars():
+        tokens = car.version.split()
+        if "AT" in tokens or "AUTO" in tokens or "CVT" in tokens:
+            assert car.stock_id in automatic, car.version
+
+    # In a customer's sentence "auto" means car, not automatic transmission
+    diesel = car_service.search_cars(CarFilter(q="diésel"), limit=100)
+    assert car_service.search_cars(CarFilter(q="busco un auto diésel"), limit=100) == diesel
+    assert len(diesel) < len(automatic)
+
+
+def test_text_search_ranking_and_filters():
+    """Más términos coincidentes rankean primero y se combinan con filtros numéricos"""
+    print("\n🏁 Probando ranking BM25 combinado con filtros...")
+
+    car_service = CarService(CSV_PATH)
+    results = car_service.search_cars(CarFilter(q="4x4 diesel"), limit=5)
+    assert "TDI" in results[0].version and "4WD" in results[0].version
+
+    results = car_service.search_cars(CarFilter(q="automatico", make="toyota", max_price=400000), limit=100)
+    assert results
+    for car in results:
+        assert car.make == "Toyota" and car.price <= 400000
+
+    assert car_service.search_cars(CarFilter(q="palabrainexistente"), limit=10) == []
+    print(f"  ✅ {len(results)} Toyota automáticos bajo $400,000")
+
+
+def test_search_cache_shares_canonical_queries():
+    """Consultas equivalentes comparten entrada y devuelven lo mismo que sin caché"""
+    print("\n🗃️  Probando caché de resultados...")
+
+    car_service = CarService(CSV_PATH)
+    expected = car_service.search_cars(CarFilter(make="Volkswagen", max_price=400000), 10)
+    assert expected and all(car.make == "Volkswagen" for car in expected)
+    for make in ["vw", "VW", "volkswagn", "Volkswagen"]:
+        assert car_service.search_cars(CarFilter(make=make, max_price=400000), 10) == expected
+    assert car_service.search_cars(CarFilter(q="Diésel 4WD"), 5) == car_service.search_cars(CarFilter(q="4x4 diesel"), 5)
+
+    info = car_service.search_cache_info()
+    assert info["misses"] == 2 and info["hits"] == 5 and info["size"] == 2
+    assert info["hit_rate"] == 5 / 7
+
+    # A different limit or sort is a different result
+    car_service.search_cars(CarFilter(make="vw", max_price=400000), 3)
+    car_service.search_cars(CarFilter(make="vw", max_price=400000, q="tsi"), 10)
+    assert car_service.search_cache_info()["size"] == 4
+    print(f"  ✅ hit rate {info['hit_rate']:.0%} con {info['size']} entradas")
+
+
+def test_search_cache_invalidates_on_reload():
+    """Un catálogo nuevo descarta los resultados cacheados"""
+    print("\n♻️  Probando invalidación del caché...")
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.csv")
+    write_catalog(path, 500, seed=3)
+    car_service = CarService(path)
+    version = car_service.catalog_version
+    cheapest = car_service.search_cars(CarFilter(), 1)[0]
+    assert car_service.search_cars(CarFilter(), 1) == [cheapest]
+
+    write_catalog(path, 500, seed=4)
+    car_service.reload()
+    info = car_service.search_cache_info()
+    assert info["catalog_version"] == version + 1 and info["size"] == 0
+    assert car_service.search_cars(CarFilter(), 1)[0].price == min(car.price for car in car_service.get_all_cars())
+    assert car_service.search_cars(CarFilter(), 1)[0] != cheapest
+    print("  ✅ recarga limpia el caché")
+
+
+def test_search_cache_ignores_results_from_previous_catalog():
+    """Una búsqueda que se cruza con una recarga responde con un solo catálogo y no deja su resultado en el caché"""
+    print("\n🏁 Probando búsqueda concurrente con una recarga...")
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.csv")
+    write_catalog(path, 500, seed=3)
+    car_service = CarService(path)
+    old_cars = {car.stock_id: car for car in car_service.get_all_cars()}
+    old_cheapest = sorted(old_cars.values(), key=lambda car: car.price)[:5]
+    apply_filters = car_service._apply_filters
+
+    # The search filters the old frame, then a reload to a smaller catalog
+    # lands before it reads the cars and caches
+    def reload_midway(*args, **kwargs):
+        filtered = apply_filters(*args, **kwargs)
+        write_catalog(path, 20, seed=4)
+        car_service._apply_filters = apply_filters
+        car_service.reload()
+        return filtered
+
+    car_service._apply_filters = reload_midway
+    results = car_service.search_cars(CarFilter(), 5)
+    assert [car.price for car in results] == [car.price for car in old_cheapest]
+    assert all(old_cars[car.stock_id] == car for car in results)
+
+    cheapest = min(car.price for car in car_service.get_all_cars())
+    assert car_service.search_cars(CarFilter(), 5)[0].price == cheapest != results[0].price
+    assert car_service.search_cache_info()["hits"] == 0
+    print("  ✅ resultados del catálogo anterior completos, sin servirse después")
+
+
+def test_export_chunks_match_full_filter():
+    """La exportación por bloques encuentra lo mismo que el filtro completo, en orden de catálogo"""
+    print("\n📦 Probando exportación por bloques...")
+
+    car_service = CarService(CSV_PATH)
+    for filters in [CarFilter(), CarFilter(make="nisan", max_km=80000), CarFilter(q="4x4 diesel", max_price=900000)]:
+        expected = list(car_service._filter(filters).index)
+        for chunk_size in [1, 7, 1000]:
+            chunks = list(car_service.iter_export(filters, chunk_size))
+            assert all(len(chunk) <= chunk_size for chunk in chunks)
+            assert [i for chunk in chunks for i in chunk.index] == expected
+            assert all("_score" not in chunk.columns for chunk in chunks)
+    print("  ✅ bloques de 1, 7 y 1000 filas")
+
+
+def test_export_survives_reload_midstream():
+    """Una recarga durante la exportación no mezcla filas de dos catálogos"""
+    print("\n🔀 Probando exportación durante una recarga...")
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.csv")
+    write_catalog(path, 500, seed=3)
+    car_service = CarService(path)
+    filters = CarFilter(q="automatico", max_price=600000)
+    expected = car_service._filter(filters)
+    expected_json = [car_service.cars.fragment(i) for i in expected.index]
+
+    frames = car_service.iter_export(filters, 50)
+    fragments = car_service.iter_export_json(filters, 50)
+    first_frame, first_fragments = next(frames), next(fragments)
+    write_catalog(path, 300, seed=4)
+    car_service.reload()
+
+    exported = pd.concat([first_frame, *frames])
+    assert list(exported["stock_id"]) == list(expected["stock_id"])
+    assert first_fragments + [f for chunk in fragments for f in chunk] == expected_json
+    print(f"  ✅ {len(exported)} filas del catálogo original")
+
+
+def test_export_json_matches_car_model():
+    """El NDJSON codificado por columnas es idéntico byte a byte al de Car.model_dump"""
+    print("\n🧾 Probando codificación por columnas...")
+
+    def expected(cars, positions):
+        return [json_encoding.dumps(Car(**cars.record(i)).model_dump(mode="json")) for i in positions]
+
+    path = write_catalog(os.path.join(tempfile.mkdtemp(), "catalog.csv"), 2000, seed=5)
+    services = [
+        CarService(CSV_PATH),
+        CarService(path),
+        CarService.from_snapshot(build_snapshot(path, os.path.join(tempfile.mkdtemp(), "catalog"))),
+    ]
+    for car_service in services:
+        cars = car_service.cars
+        positions = list(range(len(cars)))
+        assert cars.fragments(positions) == expected(cars, positions)
+        assert cars.fragments(positions[::-7]) == expected(cars, positions[::-7])
+        assert cars.fragments([]) == []
+
+    # Empty and "nan" texts, numeric versions, whole floats as km and missing columns
+    edge = pd.DataFrame({
+        "stock_id": [101, 102, 103],
+        "km": [1000.0, 2500.0, 0.0],
+        "price": [250000, 199999.5, 1e6],
+        "make": ["Nissan", "Mazda", "Nissan"],
+        "model": ["Versa", "3", "Sentra"],
+        "year": [2019, 2020, 2021],
+        "version": ["", "nan", None],
+        "bluetooth": [1.5, np.nan, 2.0],
+        "largo": ["4495", None, "n/a"],
+    })
+    edge = edge.astype({name: "category" for name in ["make", "model", "version", "largo"]})
+    cars = CatalogRows(edge)
+    assert cars.fragments([2, 0, 1]) == expected(cars, [2, 0, 1])
+
+    # Rows Car rejects fail the same way
+    cars = CatalogRows(edge.assign(km=[1000.5, 2500.0, 0.0]))
+    for encode in [lambda: cars.fragments([0]), lambda: cars.fragment(0)]:
+        try:
+            encode()
+        except ValueError:
+            continue
+        raise AssertionError("Se esperaba ValueError para km fraccionario")
+    print(f"  ✅ {sum(len(s.cars) for s in services)} filas idénticas a Car.model_dump")
+
+
+def test_synthetic_catalog_is_deterministic():
+    """El generador produce el mismo catálogo por semilla y CarService lo carga"""
+    print("\n🏭 Probando generador de catálogos sintéticos...")
+
+    first = generate_catalog(5000, seed=7)
+    assert first.equals(generate_catalog(5000, seed=7))
+    assert not first.equals(generate_catalog(5000, seed=8))
+
+    sample_columns = list(CarService(CSV_PATH).df.columns)
+    assert list(first.columns) == sample_columns
+    assert first['stock_id'].is_unique
+    assert first[['largo', 'ancho', 'altura']].isna().any().all()
+    assert first.groupby('year')['price'].median().is_monotonic_increasing
+
+    path = write_catalog(os.path.join(tempfile.mkdtemp(), "catalog.csv"), 2500, seed=7, chunk_size=1000)
+    car_service = CarService(path)
+    assert len(car_service.get_all_cars()) == 2500
+    assert car_service.search_cars(CarFilter(make="toyot", max_price=400000), 5)
+    print(f"  ✅ {len(first)} filas deterministas, {len(car_service.get_all_cars())} cargadas")
+
+
+def run_all_tests():
+    """Ejecuta todas las pruebas del catálogo"""
+    print("🧪 Iniciando pruebas del catálogo\n")
+
+    tests = [
+        ("Presupuesto mensual", test_affordable_search_respects_budget),
+        ("Plan más barato", test_affordable_search_picks_cheapest_plan),
+        ("Cobertura", test_affordable_search_is_complete),
+        ("Validación", test_affordable_search_validates_query),
+        ("Snapshot", test_snapshot_matches_csv),
+        ("Snapshot único", test_ensure_snapshot_builds_once),
+        ("Marcas populares", test_popular_makes_keep_csv_order),
+        ("Sinónimos", test_text_search_synonyms),
+        ("Ranking y filtros", test_text_search_ranking_and_filters),
+        ("Caché de resultados", test_search_cache_shares_canonical_queries),
+        ("Invalidación del caché", test_search_cache_invalidates_on_reload),
+        ("Caché y recarga concurrente", test_search_cache_ignores_results_from_previous_catalog),
+        ("Exportación por bloques", test_export_chunks_match_full_filter),
+        ("Exportación durante recarga", test_export_survives_reload_midstream),
+        ("Codificación por columnas", test_export_json_matches_car_model),
+        ("Catálogo sintético", test_synthetic_catalog_is_deterministic),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+            print(f"\n✅ PASS - {test_name}")
+        except Exception as e:
+            print(f"\n❌ FAIL - {test_name}: {e}")
+
+    print(f"\nResultado: {passed}/{len(tests)} pruebas exitosas")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import select
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import openai
+
+from src.services.car_service import CarService
+from src.services.financing_service import FinancingService
+from src.services.llm_service import LLMService, UNAVAILABLE_MESSAGE
+from src.services.model_tiering import LatencyTracker, ModelTier
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_caso_ai_engineer.csv')
+
+
+class FakeModelServer:
+    """OpenAI-compatible /v1/chat/completions with an injectable latency per request.
+
+    `latency(model, n)` returns the seconds to sleep for the n-th request to
+    that model; `reply(model, body)` returns the assistant message and
+    `status(model, n)` the HTTP status (an error body for anything but 200).
+    A client that disconnects while its request is delayed is counted in
+    `cancelled`.
+    """
+
+    def __init__(self, latency, reply=None, status=None):
+        self.latency = latency
+        self.reply = reply or (lambda model, body: {"role": "assistant", "content": f"respuesta de {model}"})
+        self.status = status or (lambda model, n: 200)
+        self.requests = []
+        self.cancelled = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                model = body["model"]
+                with server._lock:
+                    n = sum(1 for m, _ in server.requests if m == model)
+                    server.requests.append((model, body))
+                if not self._wait(server.latency(model, n)):
+                    with server._lock:
+                        server.cancelled += 1
+                    return
+                status = server.status(model, n)
+                if status != 200:
+                    payload = json.dumps({"error": {"message": f"status {status}", "type": "error"}}).encode()
+                else:
+                    payload = json.dumps({
+                        "id": f"chatcmpl-{n}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "message": server.reply(model, body), "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                    }).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client abandoned this request
+
+            def _wait(self, seconds):
+                # False as soon as the client closes the connection
+                end = time.monotonic() + seconds
+                while time.monotonic() < end:
+                    readable, _, _ = select.select([self.connection], [], [], min(0.02, end - time.monotonic()))
+                    if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                        return False
+                return True
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def models(self):
+        return [model for model, _ in self.requests]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _llm(server, timeout=1.0, hedge_after=0.3, turn_timeout=10.0) -> LLMService:
+    client = openai.AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+    tiers = [
+        ModelTier(name="fast", model="fast-model", timeout_seconds=timeout),
+        ModelTier(name="strong", model="strong-model", timeout_seconds=timeout),
+    ]
+    llm = LLMService("test", CarService(CSV_PATH), FinancingService(), tiers=tiers, client=client,
+                     turn_timeout_seconds=turn_timeout)
+    llm.completions.tracker = LatencyTracker(min_samples=5, default_deadline=hedge_after)
+    return llm
+
+
+LONG_MESSAGE = "Quiero comparar " + "varias camionetas familiares y sus planes de financiamiento " * 4
+
+
+def test_tier_selection():
+    """El tier rápido elige herramientas siempre; el fuerte sólo redacta mensajes largos"""
+    print("🎚️  Probando selección de tier...")
+
+    server = FakeModelServer(latency=lambda model, n: 0.01)
+    try:
+        llm = _llm(server)
+        assert llm.process_message("hola") == "respuesta de fast-model"
+        assert llm.process_message(LONG_MESSAGE) == "respuesta de strong-model"
+        # A long conversation does not make a short follow-up complex
+        history = [{"role": "user", "content": "hola"}, {"role": "assistant", "content": "¡Hola!"}] * 3
+        assert llm.process_message("¿y el segundo?", history) == "respuesta de fast-model"
+        assert server.models() == ["fast-model", "fast-model", "strong-model", "fast-model"]
+        assert all("functions" in body for model, body in server.requests if model == "fast-model")
+        assert llm.completions.stats["hedges"] == 0
+    finally:
+        server.close()
+    print("  ✅ fast enruta cada turno y strong responde los mensajes largos")
+
+
+def test_hedged_request_beats_slow_upstream():
+    """Una respuesta lenta dispara un duplicado que gana y el turno no se atora"""
+    print("\n🏇 Probando solicitud duplicada (hedging)...")
+
+    # Heavy-tailed upstream: every third request stalls for 3 seconds
+    rng = random.Random(0)
+    server = FakeModelServer(latency=lambda model, n: 3.0 if n % 3 == 0 else rng.uniform(0.01, 0.05))
+    try:
+        llm = _llm(server, timeout=5.0, hedge_after=0.2)
+        started = time.monotonic()
+        for i in range(6):
+            assert llm.process_message(f"hola {i}") == "respuesta de fast-model"
+        elapsed = time.monotonic() - started
+        stats = llm.completions.stats
+        assert stats["hedges"] >= 2 and stats["hedge_wins"] >= 2 and stats["timeouts"] == 0
+        assert elapsed < 3.0, elapsed
+    finally:
+        server.close()
+    print(f"  ✅ 6 turnos en {elapsed:.2f}s con {stats['hedges']} duplicados")
+
+
+def test_hedge_losers_are_cancelled_under_load():
+    """Con muchos turnos en paralelo y un upstream lento, el duplicado gana y el original se cancela"""
+    print("\n🧵 Probando cancelación de solicitudes perdedoras...")
+
+    turns = 40
+    # Every turn's first request stalls; the duplicates answer right away
+    server = FakeModelServer(latency=lambda model, n: 5.0 if n < turns else 0.02)
+    try:
+        llm = _llm(server, timeout=8.0, hedge_after=0.5)
+        responses = []
+        threads = [
+            threading.Thread(target=lambda i=i: responses.append(llm.process_message(f"hola {i}")))
+            for i in range(turns)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        assert responses == ["respuesta de fast-model"] * turns
+        assert llm.completions.stats["hedge_wins"] == turns
+        assert elapsed < 2.5, elapsed
+        # The stalled originals were disconnected, not left running for 5 s
+        wait_until = time.monotonic() + 1.0
+        while server.cancelled < turns and time.monotonic() < wait_until:
+            time.sleep(0.02)
+        assert server.cancelled == turns
+    finally:
+        server.close()
+    print(f"  ✅ {turns} turnos en {elapsed:.2f}s, {server.cancelled} solicitudes canceladas")
+
+
+def test_hedge_deadline_follows_p95():
+    """El plazo para duplicar sale del p95 de latencias observadas"""
+    print("\n📈 Probando plazo derivado del p95...")
+
+    tracker = LatencyTracker(min_samples=20, default_deadline=4.0)
+    assert tracker.hedge_deadline("m") == 4.0
+    for i in range(100):
+        tracker.record("m", 0.5 if i < 95 else 2.0)
+    assert 0.5 <= tracker.hedge_deadline("m") <= 2.0
+    for i in range(200):
+        tracker.record("m", 0.4)
+    assert tracker.hedge_deadline("m") == 0.4
+    print(f"  ✅ plazo de {tracker.hedge_deadline('m')}s tras 200 muestras")
+
+
+def _search_then_reply(model, body):
+    """Route every turn to search_cars, then answer as the model that rephrases"""
+    if "functions" in body:
+        arguments = json.dumps({"make": "Toyota", "limit": 2})
+        return {"role": "assistant", "content": None,
+                "function_call": {"name": "search_cars", "arguments": arguments}}
+    return {"role": "assistant", "content": f"respuesta de {model}"}
+
+
+def test_timeout_falls_back_to_cheaper_tier():
+    """Si el tier fuerte no responde a tiempo se usa el rápido, sin repetir una respuesta ya obtenida"""
+    print("\n🪂 Probando fallback a un tier más barato...")
+
+    server = FakeModelServer(latency=lambda model, n: 5.0 if model == "strong-model" else 0.01,
+                             reply=_search_then_reply)
+    try:
+        llm = _llm(server, timeout=0.5, hedge_after=0.2)
+        started = time.monotonic()
+        assert llm.process_message(LONG_MESSAGE) == "respuesta de fast-model"
+        assert time.monotonic() - started < 1.5
+        assert server.models() == ["fast-model", "strong-model", "strong-model", "fast-model"]
+        assert llm.completions.stats["fallbacks"] == 1
+    finally:
+        server.close()
+
+    # Without a tool call the routing reply is already an answer
+    server = FakeModelServer(latency=lambda model, n: 5.0 if model == "strong-model" else 0.01)
+    try:
+        llm = _llm(server, timeout=0.5, hedge_after=0.2)
+        assert llm.process_message(LONG_MESSAGE) == "respuesta de fast-model"
+        assert server.models() == ["fast-model", "strong-model", "strong-model"]
+        assert llm.completions.stats["fallbacks"] == 0
+    finally:
+        server.close()
+    print("  ✅ strong agotó su tiempo y respondió fast")
+
+
+def test_turn_deadline_bounds_every_call():
+    """Todas las llamadas de un turno comparten un solo plazo"""
+    print("\n⏱️  Probando plazo por turno...")
+
+    server = FakeModelServer(latency=lambda model, n: 0.01 if (model, n) == ("fast-model", 0) else 5.0,
+                             reply=_search_then_reply)
+    try:
+        # Each tier alone could take 3 s; the whole turn gets 1 s
+        llm = _llm(server, timeout=3.0, hedge_after=2.0, turn_timeout=1.0)
+        started = time.monotonic()
+        response = llm.process_message(LONG_MESSAGE)
+        elapsed = time.monotonic() - started
+        assert response.startswith("Encontré 2 autos")
+        assert elapsed < 1.5, elapsed
+        # Strong used up the budget, so fast is not tried after it
+        assert server.models() == ["fast-model", "strong-model"]
+    finally:
+        server.close()
+    print(f"  ✅ turno resuelto en {elapsed:.2f}s con el resultado de la herramienta")
+
+
+def test_client_errors_do_not_fall_back():
+    """Un 401 se reporta como error sin reintentos; un 503 del tier fuerte sí cae al rápido"""
+    print("\n🚫 Probando errores que no ameritan fallback...")
+
+    server = FakeModelServer(latency=lambda model, n: 0.01, status=lambda model, n: 401)
+    try:
+        llm = _llm(server)
+        try:
+            llm.completions.create("strong", messages=[{"role": "user", "content": "hola"}])
+            assert False, "401 should propagate"
+        except openai.AuthenticationError:
+            pass
+        assert server.models() == ["strong-model"]
+        assert llm.completions.stats["fallbacks"] == 0
+
+        response = llm.process_message("hola")
+        assert response != UNAVAILABLE_MESSAGE and "status 401" in response
+        assert server.models() == ["strong-model", "fast-model"]
+    finally:
+        server.close()
+
+    server = FakeModelServer(latency=lambda model, n: 0.01, reply=_search_then_reply,
+                             status=lambda model, n: 503 if model == "strong-model" else 200)
+    try:
+        llm = _llm(server)
+        assert llm.process_message(LONG_MESSAGE) == "respuesta de fast-model"
+        assert server.models() == ["fast-model", "strong-model", "fast-model"]
+        assert llm.completions.stats["fallbacks"] == 1
+    finally:
+        server.close()
+    print("  ✅ 401 sin fallback, 503 con fallback")
+
+
+def test_stats_are_counted_under_concurrency():
+    """Los contadores no pierden incrementos con muchos turnos en paralelo"""
+    print("\n🧮 Probando contadores concurrentes...")
+
+    server = FakeModelServer(latency=lambda model, n: 0.001)
+    try:
+        llm = _llm(server)
+        threads = [
+            threading.Thread(target=lambda: [llm.process_message("hola") for _ in range(10)])
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert llm.completions.stats["requests"] == len(server.requests) == 80
+    finally:
+        server.close()
+    print("  ✅ 80 solicitudes contadas")
+
+
+def test_template_response_when_every_tier_times_out():
+    """Sin ningún modelo disponible se responde con plantilla o con el resultado de la herramienta"""
+    print("\n🧯 Probando respuesta de plantilla...")
+
+    server = FakeModelServer(latency=lambda model, n: 5.0)
+    try:
+        llm = _llm(server, timeout=0.3, hedge_after=0.1)
+        assert llm.process_message("hola") == UNAVAILABLE_MESSAGE
+    finally:
+        server.close()
+
+    def reply(model, body):
+        if "functions" in body:
+            arguments = json.dumps({"make": "Toyota", "limit": 2})
+            return {"role": "assistant", "content": None,
+                    "function_call": {"name": "search_cars", "arguments": arguments}}
+        return {"role": "assistant", "content": "nunca llega"}
+
+    # Tool routing answers fast, every rephrase stalls
+    server = FakeModelServer(latency=lambda model, n: 0.01 if n == 0 else 5.0, reply=reply)
+    try:
+        llm = _llm(server, timeout=0.3, hedge_after=0.1)
+        response = llm.process_message("busco un Toyota")
+        assert response.startswith("Encontré 2 autos") and "Toyota" in response
+    finally:
+        server.close()
+    print("  ✅ Plantilla y resultado de búsqueda como respaldo")
+
+
+def test_follow_up_resolves_from_tool_memory():
+    """'Financia el segundo a 5 años' usa la memoria y get_car_by_id sin volver a buscar"""
+    print("\n🧠 Probando referencias a resultados anteriores...")
+
+    calls = iter([
+        ("search_cars", {"make": "Toyota", "limit": 3}),
+        ("calculate_financing", {"ordinal": 2, "years": 5}),
+        ("get_car_details", {"ordinal": 1}),
+    ])
+
+    def reply(model, body):
+        if "functions" in body:
+            name, arguments = next(calls)
+            return {"role": "assistant", "content": None,
+                    "function_call": {"name": name, "arguments": json.dumps(arguments)}}
+        return {"role": "assistant", "content": body["messages"][-1]["content"]}
+
+    server = FakeModelServer(latency=lambda model, n: 0.01, reply=reply)
+    try:
+        llm = _llm(server)
+        searches = []
+        search_cars = llm.car_service.search_cars
+        llm.car_service.search_cars = lambda *args: searches.append(args) or search_cars(*args)
+
+        memory = {}
+        llm.process_message("busco un Toyota", [], memory)
+        shown = [car["stock_id"] for car in memory["cars"]]
+        assert len(shown) == 3 and len(searches) == 1
+
+        second = llm.car_service.get_car_by_id(shown[1])
+        response = llm.process_message("financia el segundo a 5 años", [], memory)
+        assert f"Precio del auto: ${second.price:,.2f}" in response and "Plazo: 5 años" in response
+        assert memory["focus"] == 2 and memory["plan"]["years"] == 5
+
+        # The remembered results reach the model as a numbered list
+        prompt = server.requests[-1][1]["messages"][1]["content"]
+        assert f"2. {second.year} {second.make} {second.model}" in prompt and second.stock_id in prompt
+
+        response = llm.process_message("¿qué equipamiento tiene el primero?", [], memory)
+        assert f"ID: {shown[0]}" in response
+        assert len(searches) == 1 and memory["focus"] == 1
+    finally:
+        server.close()
+    print("  ✅ financiamiento y detalles sin una segunda búsqueda")
+
+
+def test_empty_search_keeps_previous_results():
+    """Una búsqueda sin resultados no borra los autos que ya se mostraron"""
+    print("\n🫙 Probando búsqueda vacía...")
+
+    calls = iter([
+        ("search_cars", {"make": "Toyota", "limit": 3}),
+        ("search_cars", {"make": "Toyota", "max_price": 1, "limit": 3}),
+        ("calculate_financing", {"ordinal": 2, "years": 4}),
+    ])
+
+    def reply(model, body):
+        if "functions" in body:
+            name, arguments = next(calls)
+            return {"role": "assistant", "content": None,
+                    "function_call": {"name": name, "arguments": json.dumps(arguments)}}
+        return {"role": "assistant", "content": body["messages"][-1]["content"]}
+
+    server = FakeModelServer(latency=lambda model, n: 0.01, reply=reply)
+    try:
+        llm = _llm(server)
+        memory = {}
+        llm.process_message("busco un Toyota", [], memory)
+        shown = list(memory["cars"])
+        assert len(shown) == 3
+
+        response = llm.process_message("¿alguno por menos de un peso?", [], memory)
+        assert response.startswith("No se encontraron autos")
+        assert memory["cars"] == shown
+
+        response = llm.process_message("financia el segundo a 4 años", [], memory)
+        second = llm.car_service.get_car_by_id(shown[1]["stock_id"])
+        assert f"Precio del auto: ${second.price:,.2f}" in response and memory["focus"] == 2
+    finally:
+        server.close()
+    print("  ✅ los 3 autos siguen disponibles tras una búsqueda vacía")
+
+
+def run_all_tests():
+    """Ejecuta todas las pruebas del servicio LLM"""
+    print("🧪 Iniciando pruebas del servicio LLM\n")
+
+    tests = [
+        ("Selección de tier", test_tier_selection),
+        ("Hedging", test_hedged_request_beats_slow_upstream),
+        ("Cancelación de perdedoras", test_hedge_losers_are_cancelled_under_load),
+        ("Plazo p95", test_hedge_deadline_follows_p95),
+        ("Fallback", test_timeout_falls_back_to_cheaper_tier),
+        ("Plazo por turno", test_turn_deadline_bounds_every_call),
+        ("Errores sin fallback", test_client_errors_do_not_fall_back),
+        ("Contadores concurrentes", test_stats_are_counted_under_concurrency),
+        ("Plantilla", test_template_response_when_every_tier_times_out),
+        ("Memoria de herramientas", test_follow_up_resolves_from_tool_memory),
+        ("Búsqueda vacía", test_empty_search_keeps_previous_results),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+            print(f"\n✅ PASS - {test_name}")
+        except Exception as e:
+            print(f"\n❌ FAIL - {test_name}: {e}")
+
+    print(f"\nResultado: {passed}/{len(tests)} pruebas exitosas")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.session_store import InMemorySessionStore, SQLiteSessionStore
+from src.services.whatsapp_service import WhatsAppService
+from src.services.turn_cache import SQLiteTurnDeduplicator, TurnDeduplicator
+from src.services.message_coalescer import MessageCoalescer
+
+
+class SlowModel:
+    """Stand-in for LLMService.process_message that counts calls"""
+
+    def __init__(self, delay: float = 0.2, fail_times: int = 0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, message, history, memory=None):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if call <= self.fail_times:
+            raise RuntimeError("modelo caído")
+        return f"respuesta {call} a '{message}' con {len(history)} mensajes previos"
+
+
+def _service(**kwargs) -> WhatsAppService:
+    return WhatsAppService("AC_test", "token", "+10000000000", **kwargs)
+
+
+def _respond(service, body, message_sid, model, phone_number="whatsapp:+521"):
+    return asyncio.run(service.respond(phone_number, body, message_sid, model))
+
+
+def _webhooks(calls, gap=0.0):
+    """Run webhook coroutines concurrently on one event loop, started `gap` seconds apart"""
+    async def run():
+        tasks = []
+        for call in calls:
+            tasks.append(asyncio.create_task(call()))
+            await asyncio.sleep(gap)
+        return await asyncio.gather(*tasks)
+    return asyncio.run(run())
+
+
+def _append_from_worker(args):
+    db_path, phone_number, count = args
+    store = SQLiteSessionStore(db_path)
+    for i in range(count):
+        store.append(phone_number, {"role": "user", "content": f"{os.getpid()}-{i}"})
+    return count
+
+
+def test_history_is_trimmed():
+    """El historial guarda solo los últimos mensajes"""
+    print("💬 Probando historial de conversación...")
+
+    service = _service(session_store=InMemorySessionStore())
+    for i in range(15):
+        service.handle_incoming_message("whatsapp:+5215555555555", f"mensaje {i}")
+
+    history = service.get_conversation_history("whatsapp:+5215555555555")
+    assert len(history) == WhatsAppService.MAX_HISTORY
+    assert history[-1]["content"] == "mensaje 14"
+    print(f"  ✅ {len(history)} mensajes conservados")
+
+
+def test_sqlite_store_is_shared_across_processes():
+    """Varios procesos escriben el mismo historial sin perder mensajes"""
+    print("\n🗄️  Probando historial compartido entre procesos...")
+
+    db_path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    SQLiteSessionStore(db_path)
+    with Pool(4) as pool:
+        written = sum(pool.map(_append_from_worker, [(db_path, "whatsapp:+521", 25)] * 4))
+
+    store = SQLiteSessionStore(db_path)
+    assert len(store.get("whatsapp:+521")) == written == 100
+    assert store._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    service = _service(session_store=store)
+    service.clear_conversation("whatsapp:+521")
+    assert "whatsapp:+521" not in store
+    print(f"  ✅ {written} mensajes escritos desde 4 procesos")
+
+
+def test_tool_memory_persists_between_turns():
+    """La memoria de herramientas de un turno llega al siguiente y se borra con la conversación"""
+    print("\n🧠 Probando memoria de herramientas por sesión...")
+
+    store = SQLiteSessionStore(os.path.join(tempfile.mkdtemp(), "sessions.db"))
+    service = _service(session_store=store)
+    seen = []
+
+    def model(message, history, memory):
+        seen.append(dict(memory))
+        memory["cars"] = memory.get("cars", []) + [{"stock_id": message, "label": "auto", "price": 1.0}]
+        return "ok"
+
+    _respond(service, "101", "SM1", model)
+    _respond(service, "202", "SM2", model)
+    assert seen[0] == {} and [car["stock_id"] for car in seen[1]["cars"]] == ["101"]
+    assert [car["stock_id"] for car in store.get_memory("whatsapp:+521")["cars"]] == ["101", "202"]
+    assert store.get_memory("whatsapp:+522") == {}
+
+    service.clear_conversation("whatsapp:+521")
+    assert store.get_memory("whatsapp:+521") == {}
+    print("  ✅ memoria guardada en SQLite entre turnos")
+
+
+def test_retry_storm_runs_one_turn():
+    """Reintentos concurrentes con el mismo MessageSid llaman al modelo una sola vez"""
+    print("\n🌩️  Probando tormenta de reintentos de Twilio...")
+
+    service = _service()
+    model = SlowModel(delay=0.3)
+    replies = _webhooks([lambda: service.respond("whatsapp:+521", "busco un SUV", "SM1", model)] * 20)
+
+    # Late retries after completion are answered from the cache too
+    for _ in range(5):
+        replies.append(_respond(service, "busco un SUV", "SM1", model))
+
+    assert model.calls == 1
+    assert len(set(replies)) == 1 and replies[0].startswith("respuesta 1")
+    history = service.get_conversation_history("whatsapp:+521")
+    assert [m["role"] for m in history] == ["user", "assistant"]
+    assert service.deduplicator.duplicates == 24
+    print(f"  ✅ {len(replies)} respuestas, 1 llamada al modelo")
+
+
+def test_retry_on_another_worker_runs_one_turn():
+    """Un reintento que cae en otro worker espera el turno original en SQLite"""
+    print("\n🔀 Probando reintentos entre workers...")
+
+    db_path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    workers = [
+        _service(session_store=SQLiteSessionStore(db_path), deduplicator=SQLiteTurnDeduplicator(db_path))
+        for _ in range(2)
+    ]
+    model = SlowModel(delay=0.3)
+    replies = _webhooks(
+        [lambda worker=worker: worker.respond("whatsapp:+521", "busco un SUV", "SM1", model) for worker in workers * 3],
+        gap=0.02
+    )
+    replies.append(_respond(workers[1], "busco un SUV", "SM1", model))
+
+    assert model.calls == 1
+    assert len(set(replies)) == 1 and replies[0].startswith("respuesta 1")
+    history = workers[1].get_conversation_history("whatsapp:+521")
+    assert [m["role"] for m in history] == ["user", "assistant"]
+    assert sum(worker.deduplicator.duplicates for worker in workers) == 6
+    print(f"  ✅ {len(replies)} respuestas desde 2 workers, 1 llamada al modelo")
+
+
+def test_distinct_messages_keep_history():
+    """Mensajes distintos se procesan y ven el historial previo"""
+    print("\n🧵 Probando mensajes distintos en la misma conversación...")
+
+    service = _service()
+    model = SlowModel(delay=0)
+    _respond(service, "hola", "SM1", model)
+    reply = _respond(service, "busco un sedán", "SM2", model)
+
+    assert model.calls == 2
+    assert "2 mensajes previos" in reply
+    assert len(service.get_conversation_history("whatsapp:+521")) == 4
+    print("  ✅ El segundo turno recibió el historial del primero")
+
+
+def test_failed_turn_can_be_retried():
+    """Si el turno falla, el siguiente reintento vuelve a intentarlo sin duplicar historial"""
+    print("\n🔁 Probando reintento después de un error...")
+
+    service = _service()
+    model = SlowModel(delay=0, fail_times=1)
+    try:
+        _respond(service, "hola", "SM1", model)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Se esperaba el error del modelo")
+
+    assert service.get_conversation_history("whatsapp:+521") == []
+    reply = _respond(service, "hola", "SM1", model)
+    assert model.calls == 2 and reply == "respuesta 2 a 'hola' con 0 mensajes previos"
+    history = service.get_conversation_history("whatsapp:+521")
+    assert [(m["role"], m["content"]) for m in history] == [("user", "hola"), ("assistant", reply)]
+    print("  ✅ El reintento se procesó después del error")
+
+
+def test_dedupe_cache_is_bounded():
+    """El cache expira por TTL y no crece más allá de su límite"""
+    print("\n⏱️  Probando TTL y tamaño del cache de turnos...")
+
+    now = [0.0]
+    cache = TurnDeduplicator(ttl_seconds=60, max_entries=3, clock=lambda: now[0])
+    for i in range(5):
+        cache.claim(f"SM{i}")
+    assert len(cache) == 3
+    assert cache.claim("SM4") is False
+
+    now[0] = 61
+    assert cache.claim("SM4") is True
+    assert len(cache) == 1
+
+    shared = SQLiteTurnDeduplicator(os.path.join(tempfile.mkdtemp(), "sessions.db"),
+                                    ttl_seconds=60, max_entries=3, clock=lambda: now[0])
+    for i in range(5):
+        shared.claim(f"SM{i}")
+    assert len(shared) == 3
+    assert shared.claim("SM4") is False
+    now[0] = 122
+    assert shared.claim("SM4") is True and len(shared) == 1
+    print("  ✅ Cache acotado a 3 entradas y expirado a los 60 s")
+
+
+def _send_burst(service, model, messages, gap=0.05):
+    return _webhooks(
+        [lambda i=i, body=body: service.respond("whatsapp:+521", body, f"SM{i}", model) for i, body in enumerate(messages)],
+        gap=gap
+    )
+
+
+def test_burst_is_coalesced_into_one_turn():
+    """Mensajes seguidos se combinan en un solo turno y una sola respuesta"""
+    print("\n🧺 Probando combinación de mensajes seguidos...")
+
+    service = _service(coalescer=MessageCoalescer(window_seconds=0.3))
+    model = SlowModel(delay=0)
+    replies = _send_burst(service, model, ["hola", "busco un auto", "tipo SUV", "menos de 400 mil"])
+
+    assert model.calls == 1
+    assert replies[:3] == [None, None, None] and replies[3] is not None
+    history = service.get_conversation_history("whatsapp:+521")
+    assert history[0]["content"] == "hola\nbusco un auto\ntipo SUV\nmenos de 400 mil"
+    stats = service.coalescer.stats()
+    assert stats["sessions"]["whatsapp:+521"]["llm_calls_saved"] == 3
+    print(f"  ✅ 4 mensajes, 1 llamada al modelo, {stats['llm_calls_saved']} llamadas ahorradas")
+
+
+def test_question_closes_window_early():
+    """Una pregunta o un mensaje largo se responde sin esperar la ventana completa"""
+    print("\n❓ Probando cierre anticipado de la ventana...")
+
+    service = _service(coalescer=MessageCoalescer(window_seconds=2.0))
+    model = SlowModel(delay=0)
+
+    started = time.monotonic()
+    replies = _send_burst(service, model, ["hola", "¿tienen SUVs híbridas?"])
+    assert time.monotonic() - started < 1.0
+    assert model.calls == 1 and replies[0] is None and replies[1] is not None
+
+    started = time.monotonic()
+    long_message = "Busco una camioneta familiar de siete pasajeros, automática, que no pase de 450 mil pesos"
+    assert _respond(service, long_message, "SM9", model) is not None
+    assert time.monotonic() - started < 1.0
+    print("  ✅ Pregunta y mensaje largo respondidos de inmediato")
+
+
+def test_window_never_exceeds_max_wait():
+    """Un flujo continuo de mensajes no retrasa la respuesta más allá del máximo"""
+    print("\n⏳ Probando espera máxima de la ventana...")
+
+    service = _service(coalescer=MessageCoalescer(window_seconds=0.3, max_wait_seconds=0.5))
+    model = SlowModel(delay=0)
+    replies = _send_burst(service, model, [f"mensaje {i}" for i in range(8)], gap=0.15)
+
+    assert 2 <= model.calls < 8
+    assert sum(reply is not None for reply in replies) == model.calls
+    print(f"  ✅ 8 mensajes en {model.calls} turnos")
+
+
+def test_coalescing_holds_no_threads():
+    """Cientos de sesiones esperando su ventana no ocupan un hilo cada una"""
+    print("\n🧵 Probando espera de la ventana sin hilos...")
+
+    service = _service(coalescer=MessageCoalescer(window_seconds=0.5), max_workers=4)
+    model = SlowModel(delay=0)
+    threads = []
+
+    async def watch():
+        await asyncio.sleep(0.25)
+        threads.append(threading.active_count())
+
+    async def run():
+        calls = [service.respond(f"whatsapp:+52{i}", "hola", f"SM{i}", model) for i in range(200)]
+        return await asyncio.gather(watch(), *calls)
+
+    before = threading.active_count()
+    replies = asyncio.run(run())[1:]
+    # Only the service's own executor threads, however many sessions wait
+    assert threads[0] <= before + 4
+    assert model.calls == 200 and all(reply is not None for reply in replies)
+    print(f"  ✅ 200 sesiones en espera con {threads[0]} hilos")
+
+
+def test_coalescer_stats_are_bounded():
+    """Las estadísticas por sesión expiran y se limitan; los totales se conservan"""
+    print("\n📊 Probando estadísticas acotadas del coalescer...")
+
+    now = [0.0]
+    coalescer = MessageCoalescer(window_seconds=0, stats_ttl_seconds=60, max_sessions=3, clock=lambda: now[0])
+
+    async def send(count):
+        for i in range(count):
+            await coalescer.submit(f"whatsapp:+52{i}", "hola")
+
+    asyncio.run(send(5))
+    stats = coalescer.stats()
+    assert list(stats["sessions"]) == ["whatsapp:+522", "whatsapp:+523", "whatsapp:+524"]
+    assert stats["messages"] == stats["turns"] == 5
+
+    now[0] = 61
+    asyncio.run(send(1))
+    stats = coalescer.stats()
+    assert list(stats["sessions"]) == ["whatsapp:+520"] and stats["messages"] == 6
+    print("  ✅ 3 sesiones como máximo, expiradas a los 60 s")
+
+
+def run_all_tests():
+    """Ejecuta todas las pruebas de WhatsApp"""
+    print("🧪 Iniciando pruebas de WhatsApp\n")
+
+    tests = [
+        ("Historial", test_history_is_trimmed),
+        ("Historial entre procesos", test_sqlite_store_is_shared_across_processes),
+        ("Memoria de herramientas", test_tool_memory_persists_between_turns),
+        ("Tormenta de reintentos", test_retry_storm_runs_one_turn),
+        ("Reintentos entre workers", test_retry_on_another_worker_runs_one_turn),
+        ("Mensajes distintos", test_distinct_messages_keep_history),
+        ("Reintento tras error", test_failed_turn_can_be_retried),
+        ("Cache acotado", test_dedupe_cache_is_bounded),
+        ("Mensajes combinados", test_burst_is_coalesced_into_one_turn),
+        ("Cierre anticipado", test_question_closes_window_early),
+        ("Espera máxima", test_window_never_exceeds_max_wait),
+        ("Espera sin hilos", test_coalescing_holds_no_threads),
+        ("Estadísticas acotadas", test_coalescer_stats_are_bounded),
+    ]
+
+    passed = 0
+    for test_name, test_func in tests:
+        try:
+            test_func()
+            passed += 1
+            print(f"\n✅ PASS - {test_name}")
+        except Exception as e:
+            print(f"\n❌ FAIL - {test_name}: {e}")
+
+    print(f"\nResultado: {passed}/{len(tests)} pruebas exitosas")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)